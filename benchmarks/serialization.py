@@ -0,0 +1,76 @@
+"""Compare the list endpoints' old and new serialization paths on a large page.
+
+Run with the application's environment set:
+
+    python -m benchmarks.serialization --rows 10000
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from storage_app.articles.models.api_article_models import ArticlePage
+from storage_app.articles.models.db_article_models import Article, Category, Language
+from storage_app.db_config import Base
+from storage_app.responses import page_response
+from storage_app.users.models.db_users import User
+
+
+def seed_rows(count: int) -> list:
+    start = datetime(2023, 1, 1)
+    return [{
+        'title': f'article {i}',
+        'brief_description': 'benchmark article ' * 5,
+        'category': Category(i % 5 + 1).name,
+        'language': Language(i % 2 + 1).name,
+        'url': f'https://example.com/articles/{i}',
+        'created_at': start + timedelta(seconds=i),
+        'updated_at': start + timedelta(seconds=i),
+        'user_id': 1,
+    } for i in range(count)]
+
+
+def best_of(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+async def main(rows: int, repeat: int):
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(insert(User), [{'username': 'bench', 'password': '-'}])
+        await connection.execute(insert(Article.__table__), seed_rows(rows))
+    async with engine.connect() as connection:
+        db_rows = (await connection.execute(select(Article.__table__))).all()
+
+    def pydantic_path():
+        page = ArticlePage.validate({'items': db_rows, 'next_cursor': None})
+        return json.dumps(jsonable_encoder(page)).encode()
+
+    def fast_path():
+        return page_response({'items': db_rows, 'next_cursor': None}, Response()).body
+
+    assert json.loads(pydantic_path()) == json.loads(fast_path())
+    before, after = best_of(repeat, pydantic_path), best_of(repeat, fast_path)
+    print(f"{rows} rows: pydantic + json {before * 1000:.1f} ms, rows + orjson {after * 1000:.1f} ms, "
+          f"{before / after:.1f}x faster")
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
@@ -0,0 +1,39 @@
+import argparse
+import asyncio
+import os
+import sys
+
+from storage_app.articles.controllers.import_controller import ImportController, ImportRowError, read_lines
+from storage_app.db_config import SessionLocal
+
+
+async def read_file(path: str, chunk_size: int = 1 << 16):
+    with open(path, 'rb') as file:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+async def main(path: str, fmt: str, user_id: int, chunk_size: int):
+    async with SessionLocal() as db:
+        try:
+            result = await ImportController.import_articles(lines=read_lines(read_file(path)), fmt=fmt, db=db,
+                                                            user_id=user_id, chunk_size=chunk_size)
+        except ImportRowError as e:
+            sys.exit(str(e))
+    print(f"imported: {result['imported']}, invalid: {result['invalid']}")
+    for error in result['errors']:
+        print(f"line {error['line']}: {error['errors']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import of articles from NDJSON or CSV file")
+    parser.add_argument('path')
+    parser.add_argument('--user-id', type=int, required=True, help="owner of imported articles")
+    parser.add_argument('--format', choices=['ndjson', 'csv'], help="defaults to file extension")
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+    fmt = args.format or ('csv' if os.path.splitext(args.path)[1].lower() == '.csv' else 'ndjson')
+    asyncio.run(main(args.path, fmt=fmt, user_id=args.user_id, chunk_size=args.chunk_size))
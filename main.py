@@ -1,9 +1,17 @@
+import asyncio
+from contextlib import suppress
+
 import uvicorn
 from fastapi import FastAPI
 
+from storage_app.articles.controllers.article_events import article_events
+from storage_app.authentication.controllers.revocation_controller import RevocationController
 from storage_app.authentication.views import authentication_views
 from storage_app.users.views import api_users
 from storage_app.articles.views import api_articles
+from storage_app.internal.views import internal_views, metrics_views
+from storage_app.metrics import MetricsMiddleware
+from storage_app.profiler import ProfilerMiddleware
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -16,10 +24,38 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilerMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(authentication_views.router)
 app.include_router(api_users.router)
 app.include_router(api_articles.router)
+app.include_router(internal_views.router)
+app.include_router(metrics_views.router)
+
+
+@app.on_event("startup")
+async def start_revocation_sync():
+    # Kept on app.state: the loop only holds weak references to tasks
+    app.state.revocation_sync = asyncio.create_task(RevocationController.sync_forever())
+
+
+@app.on_event("shutdown")
+async def stop_revocation_sync():
+    app.state.revocation_sync.cancel()
+    with suppress(asyncio.CancelledError):
+        await app.state.revocation_sync
+
+
+@app.on_event("startup")
+async def start_article_events():
+    await article_events.start()
+
+
+@app.on_event("shutdown")
+async def stop_article_events():
+    await article_events.stop()
+
 
 if __name__ == "__main__":
     uvicorn.run('main:app', port=8000, reload=True)
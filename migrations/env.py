@@ -10,7 +10,8 @@ from alembic import context
 from storage_app.db_config import Base
 from storage_app.config import SETTINGS as s
 from storage_app.users.models.db_users import User
-from storage_app.articles.models.db_article_models import Article
+from storage_app.articles.models.db_article_models import Article, ArticleTombstone
+from storage_app.authentication.models.db_revoked_tokens import RevokedToken
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
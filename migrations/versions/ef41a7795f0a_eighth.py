@@ -0,0 +1,32 @@
+"""eighth
+
+Revision ID: ef41a7795f0a
+Revises: f9c73f1d3935
+Create Date: 2026-10-18 15:07:33.580941
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy_utils
+
+
+# revision identifiers, used by Alembic.
+revision = 'ef41a7795f0a'
+down_revision = 'f9c73f1d3935'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "ALTER TABLE articles ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "to_tsvector(CASE WHEN language = 'RUSSIAN' THEN 'russian'::regconfig ELSE 'english'::regconfig END, "
+        "coalesce(title, '') || ' ' || coalesce(brief_description, ''))) STORED"
+    )
+    op.create_index('ix_articles_search_vector', 'articles', ['search_vector'], unique=False,
+                    postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_articles_search_vector', table_name='articles')
+    op.drop_column('articles', 'search_vector')
@@ -1,12 +1,48 @@
+import heapq
+from itertools import islice
+from typing import List, Optional, Sequence, Tuple
+
 from fastapi import HTTPException, status
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from storage_app.articles.controllers.article_cache import article_cache, article_key, invalidate_articles
+from storage_app.articles.controllers.article_events import article_event, publish_article_events
 from storage_app.articles.controllers.db_article_controller import DBArticleController
-from storage_app.articles.models.api_article_models import ArticleCreate, ArticlePatch
+from storage_app.articles.models.api_article_models import ArticleCreate, ArticleFilter, ArticlePatch, \
+    ArticleRecord, ChangeType
+from storage_app.config import SETTINGS
+from storage_app.db_config import primary_or_none
+from storage_app.fieldsets import InvalidFields, parse_fields
 from storage_app.logger_config import logger
+from storage_app.pagination import InvalidCursor, build_page, decode_cursor, encode_cursor
+from storage_app.responses import ARTICLE_FIELDS, dump_articles
 from storage_app.users.models.api_users import UserOut
 
 
+def parse_cursor(cursor: Optional[str]):
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except InvalidCursor:
+        logger.error(f"Attempt to paginate with malformed cursor {cursor}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def requested_fields(fields: Optional[str], allowed: Sequence[str] = ARTICLE_FIELDS) -> Optional[Tuple[str, ...]]:
+    try:
+        return parse_fields(fields, allowed)
+    except InvalidFields as e:
+        logger.error(f"Attempt to request unknown fields {e}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown fields: {e}")
+
+
+async def load_article(article_id: int, db: AsyncSession) -> Optional[ArticleRecord]:
+    article = await DBArticleController.get_article_by_id(article_id=article_id, db=db)
+    return ArticleRecord.from_orm(article) if article else None
+
+
 class APIArticleController:
     @staticmethod
     async def create_article(article: ArticleCreate, db: AsyncSession, user_id: int):
@@ -14,45 +50,107 @@ class APIArticleController:
             new_article = await DBArticleController.create_article(article=article, db=db, user_id=user_id)
         except Exception:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Repeat request later")
+        await invalidate_articles(user_id)
+        await publish_article_events(article_event(ChangeType.CREATED, new_article.id, user_id, new_article))
         return new_article
 
+    @staticmethod
+    async def create_articles(items: List[dict], db: AsyncSession, user_id: int):
+        """Validate every item, then insert all valid ones at once; invalid ones are reported by index.
+        If no item is valid nothing is created, and the errors come back with 422"""
+        articles, errors = [], []
+        for index, item in enumerate(items):
+            try:
+                articles.append(ArticleCreate.parse_obj(item))
+            except ValidationError as e:
+                errors.append({'index': index, 'errors': e.errors()})
+        if not articles:
+            logger.error(f"Attempt to create a batch of {len(items)} articles, none of them valid")
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=errors)
+        try:
+            created = await DBArticleController.create_articles(articles=articles, db=db, user_id=user_id)
+        except Exception:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Repeat request later")
+        await invalidate_articles(user_id)
+        await publish_article_events(*(article_event(ChangeType.CREATED, article.id, user_id, article)
+                                       for article in created))
+        return {'created': created, 'errors': errors}
+
     @staticmethod
     async def get_article(article_id: int, db: AsyncSession):
-        article = await DBArticleController.get_article_by_id(article_id=article_id, db=db)
+        article = await article_cache.get_or_load(article_key(article_id),
+                                                  lambda session: load_article(article_id, session),
+                                                  primary_or_none(db))
         if not article:
             logger.error(f"Attempt to get nonexistent article with id {article_id}")
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User not found")
         return article
 
     @staticmethod
-    async def get_articles(db: AsyncSession):
-        return await DBArticleController.get_articles(db=db)
+    async def get_articles(db: AsyncSession, limit: int, cursor: Optional[str] = None,
+                           filters: Optional[ArticleFilter] = None, fields: Optional[Sequence[str]] = None):
+        articles = await DBArticleController.get_articles(db=db, limit=limit, cursor=parse_cursor(cursor),
+                                                          filters=filters, fields=fields)
+        return build_page(articles, limit=limit)
+
+    @staticmethod
+    async def get_changes(db: AsyncSession, limit: int, since: Optional[str] = None):
+        """Changes after since, oldest first; next_cursor resumes right after the last one returned.
+
+        The order comes from UTC timestamps of the database clock, taken at transaction start rather than commit:
+        the CHANGE_FEED_SETTLE_SECONDS hold-back protects clients from transactions committing late.
+        """
+        articles, tombstones = await DBArticleController.get_changes(
+            db=db, limit=limit, settle=SETTINGS.CHANGE_FEED_SETTLE_SECONDS, since=parse_cursor(since))
+        changes = heapq.merge(
+            ({'id': row.id, 'change': ChangeType.CREATED if row.version == 1 else ChangeType.UPDATED,
+              'changed_at': row.updated_at, 'version': row.version, 'article': row} for row in articles),
+            ({'id': tombstone.article_id, 'change': ChangeType.DELETED, 'changed_at': tombstone.deleted_at}
+             for tombstone in tombstones),
+            key=lambda change: (change['changed_at'], change['id']))
+        items = list(islice(changes, limit + 1))
+        has_more = len(items) > limit
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1]['changed_at'], items[-1]['id']) if items else since
+        return {'items': items, 'next_cursor': next_cursor, 'has_more': has_more}
+
+    @staticmethod
+    async def search_articles(q: str, db: AsyncSession, limit: int):
+        if not q.split():
+            return []
+        return await DBArticleController.search_articles(q=q, db=db, limit=limit)
+
+    @staticmethod
+    async def export_articles(db: AsyncSession, batch_size: int = 1000):
+        """Serialize articles as newline-delimited JSON, one chunk per fetched batch"""
+        async for rows in DBArticleController.stream_articles(db=db, batch_size=batch_size):
+            yield dump_articles(rows)
 
     @staticmethod
     async def delete_article(article_id: int, db: AsyncSession, user_id: int):
-        article_db = await DBArticleController.get_article_by_id(article_id=article_id, db=db)
-        if not article_db:
-            logger.error(f"Attempt to get nonexistent article with id {article_id}")
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Article {article_id} not found")
-        if article_db.user_id != user_id:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                                detail='You are not allowed to perform this action')
-        await DBArticleController.delete_article(article_id=article_id, db=db)
+        if not await DBArticleController.delete_article(article_id=article_id, db=db, user_id=user_id):
+            await APIArticleController.reject_write(article_id=article_id, db=db)
+        await invalidate_articles(user_id, article_id)
+        await publish_article_events(article_event(ChangeType.DELETED, article_id, user_id))
         return {'deleted'}
 
     @staticmethod
     async def update_article(article: ArticlePatch, article_id: int, db: AsyncSession, user_id: int):
-        article_db = await DBArticleController.get_article_by_id(article_id=article_id, db=db)
-        if not article_db:
-            logger.error(f"Attempt to update nonexistent article with id {article_id}")
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Article {article_id} not found")
-        if article_db.user_id != user_id:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                                detail='You are not allowed to perform this action')
         try:
-            updated_article = await DBArticleController.update_article(article=article, article_id=article_id, db=db)
+            updated_article = await DBArticleController.update_article(article=article, article_id=article_id, db=db,
+                                                                       user_id=user_id)
         except Exception:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Something's wrong. Repeat request later")
+        if not updated_article:
+            await APIArticleController.reject_write(article_id=article_id, db=db)
+        await invalidate_articles(user_id, article_id)
+        await publish_article_events(article_event(ChangeType.UPDATED, article_id, user_id, updated_article))
         return updated_article
 
-
+    @staticmethod
+    async def reject_write(article_id: int, db: AsyncSession):
+        """Write matched no article of this user: tell apart missing article from someone else's"""
+        if not await DBArticleController.get_article_by_id(article_id=article_id, db=db):
+            logger.error(f"Attempt to change nonexistent article with id {article_id}")
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Article {article_id} not found")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='You are not allowed to perform this action')
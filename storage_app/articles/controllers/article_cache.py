@@ -0,0 +1,38 @@
+from typing import Optional
+
+from storage_app.articles.models.api_article_models import ArticleRecord, ArticleRecordPage
+from storage_app.cache import MemoryBackend, ReadThroughCache, RedisBackend
+from storage_app.config import SETTINGS
+from storage_app.db_config import SessionLocal
+
+
+def make_backend(url: Optional[str]):
+    """Redis when ARTICLE_CACHE_URL is set (shared by all workers), in-process LRU otherwise"""
+    if url:
+        return RedisBackend.from_url(url, models={'article': ArticleRecord, 'user-articles': ArticleRecordPage})
+    return MemoryBackend(maxsize=SETTINGS.ARTICLE_CACHE_SIZE,
+                         counter_ttl=SETTINGS.ARTICLE_CACHE_TTL_SECONDS + SETTINGS.ARTICLE_CACHE_STALE_SECONDS)
+
+
+article_cache = ReadThroughCache(
+    make_backend(SETTINGS.ARTICLE_CACHE_URL),
+    ttl=SETTINGS.ARTICLE_CACHE_TTL_SECONDS,
+    stale_ttl=SETTINGS.ARTICLE_CACHE_STALE_SECONDS,
+    session_factory=SessionLocal,
+    name='article-cache',
+)
+
+
+def article_key(article_id: int) -> str:
+    return f'article:{article_id}'
+
+
+async def user_articles_key(user_id: int, limit: int, cursor: Optional[str]) -> str:
+    """Pages of one user are keyed by generation, so a write drops all of them with one bump"""
+    generation = await article_cache.generation(f'user-articles:{user_id}')
+    return f'user-articles:{user_id}:{generation}:{limit}:{cursor or ""}'
+
+
+async def invalidate_articles(user_id: int, *article_ids: int):
+    await article_cache.delete(*(article_key(article_id) for article_id in article_ids))
+    await article_cache.bump(f'user-articles:{user_id}')
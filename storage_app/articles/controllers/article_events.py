@@ -0,0 +1,28 @@
+from storage_app.articles.models.api_article_models import ArticleOut, ChangeType
+from storage_app.config import SETTINGS
+from storage_app.db_config import engine
+from storage_app.events import MemoryBroker, PostgresBroker
+from storage_app.logger_config import logger
+
+
+def make_broker(kind: str):
+    if kind == 'postgres':
+        return PostgresBroker(engine, channel=SETTINGS.ARTICLE_EVENTS_CHANNEL,
+                              queue_size=SETTINGS.ARTICLE_EVENTS_QUEUE_SIZE)
+    return MemoryBroker(queue_size=SETTINGS.ARTICLE_EVENTS_QUEUE_SIZE)
+
+
+article_events = make_broker(SETTINGS.ARTICLE_EVENTS_BROKER)
+
+
+def article_event(change: ChangeType, article_id: int, user_id: int, article=None) -> dict:
+    return {'change': change.value, 'id': article_id, 'user_id': user_id,
+            'article': ArticleOut.from_orm(article).dict() if article is not None else None}
+
+
+async def publish_article_events(*events: dict):
+    """Tell subscribers about committed writes; a broker failure is logged, the writes have succeeded anyway"""
+    try:
+        await article_events.publish(*events)
+    except Exception as e:
+        logger.error(f"{len(events)} article events not published. Error: {e}")
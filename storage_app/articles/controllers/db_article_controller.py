@@ -1,13 +1,76 @@
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import exc, select, delete, update
+from sqlalchemy import exc, select, insert, delete, update, tuple_, func, literal_column, table, column, lambda_stmt
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.lambdas import StatementLambdaElement
 
-from storage_app.articles.models.api_article_models import ArticleCreate, ArticlePatch
-from storage_app.articles.models.db_article_models import Article
+from storage_app.articles.models.api_article_models import ArticleCreate, ArticleFilter, ArticlePatch
+from storage_app.articles.models.db_article_models import Article, ArticleTombstone
+from storage_app.db_config import utcnow
 
 from storage_app.logger_config import logger
 from storage_app.users.models.api_users import UserOut
 
 
+def keyset_page(query: StatementLambdaElement, limit: int,
+                cursor: Optional[Tuple[datetime, int]] = None) -> StatementLambdaElement:
+    """Order by (created_at, id) and start right after cursor; one extra row tells if there is a next page"""
+    if cursor:
+        created_at, article_id = cursor
+        query += lambda q: q.where(tuple_(Article.created_at, Article.id) > tuple_(created_at, article_id))
+    page_size = limit + 1
+    return query + (lambda q: q.order_by(Article.created_at, Article.id).limit(page_size))
+
+
+def article_columns(fields: Optional[Sequence[str]] = None) -> list:
+    """Columns behind fields plus the ones keyset paging and ETags need; every column when fields is None"""
+    if fields is None:
+        return list(Article.__table__.columns)
+    names = {'id', 'created_at', 'updated_at', *fields}
+    return [column for column in Article.__table__.columns if column.name in names]
+
+
+def select_columns(columns: list) -> StatementLambdaElement:
+    """Cached SELECT of columns; the column set is part of the cache key, one entry per distinct fields"""
+    return lambda_stmt(lambda: select(*columns), track_on=[tuple(columns)])
+
+
+def filter_articles(query: StatementLambdaElement, filters: Optional[ArticleFilter] = None) -> StatementLambdaElement:
+    """Turn non-empty filter fields into WHERE predicates; each one adds its own cached criteria"""
+    if not filters:
+        return query
+    category, language, user_id = filters.category, filters.language, filters.user_id
+    created_after, created_before = filters.created_after, filters.created_before
+    if category is not None:
+        query += lambda q: q.where(Article.category == category)
+    if language is not None:
+        query += lambda q: q.where(Article.language == language)
+    if user_id is not None:
+        query += lambda q: q.where(Article.user_id == user_id)
+    if created_after is not None:
+        query += lambda q: q.where(Article.created_at >= created_after)
+    if created_before is not None:
+        query += lambda q: q.where(Article.created_at < created_before)
+    return query
+
+
+def search_query(q: str, dialect: str) -> Select:
+    """Relevance-ranked match over title and brief_description using the dialect's full-text index"""
+    if dialect == 'postgresql':
+        search_vector = literal_column('articles.search_vector')
+        ts_query = func.websearch_to_tsquery(literal_column("'english'::regconfig"), q).op('||')(
+            func.websearch_to_tsquery(literal_column("'russian'::regconfig"), q))
+        return select(Article).where(search_vector.op('@@')(ts_query)) \
+            .order_by(func.ts_rank(search_vector, ts_query).desc(), Article.id)
+    articles_fts = table('articles_fts', column('rowid'), column('rank'))
+    match = ' '.join('"{}"'.format(term.replace('"', '""')) for term in q.split())
+    return select(Article).join(articles_fts, articles_fts.c.rowid == Article.id) \
+        .where(literal_column('articles_fts').op('MATCH')(match)) \
+        .order_by(articles_fts.c.rank, Article.id)
+
+
 class DBArticleController:
     @staticmethod
     async def create_article(article: ArticleCreate, db: AsyncSession, user_id: int):
@@ -24,47 +87,142 @@ class DBArticleController:
             logger.error(f"User not saved. Error: {e._message()}")
             raise Exception
 
+    @staticmethod
+    async def create_articles(articles: List[ArticleCreate], db: AsyncSession, user_id: int):
+        """Creation of many articles in one transaction, as a single multi-row INSERT where RETURNING is available"""
+        try:
+            rows = [dict(article.dict(), user_id=user_id) for article in articles]
+            if db.bind.dialect.full_returning:
+                result = await db.execute(insert(Article).values(rows).returning(*Article.__table__.columns))
+                new_articles = result.all()
+            else:
+                # Without RETURNING the defaults would be expired and lazy-loaded: take the database clock first
+                now = await db.scalar(select(utcnow()))
+                new_articles = [Article(**row, created_at=now, updated_at=now) for row in rows]
+                db.add_all(new_articles)
+                await db.flush()
+            await db.commit()
+            logger.info(f"{len(new_articles)} articles created")
+            return new_articles
+        except exc.SQLAlchemyError as e:
+            await db.rollback()
+            logger.error(f"Articles not saved. Error: {e._message()}")
+            raise Exception
+
+    @staticmethod
+    async def copy_articles(rows: List[dict], db: AsyncSession) -> int:
+        """Bulk write of validated rows: COPY through asyncpg, executemany INSERT on other drivers"""
+        try:
+            if db.bind.dialect.driver == 'asyncpg':
+                # COPY skips column defaults: stamp the rows with the database clock like INSERT does
+                now = await db.scalar(select(utcnow()))
+                rows = [dict(row, created_at=now, updated_at=now) for row in rows]
+                columns = list(rows[0])
+                connection = await (await db.connection()).get_raw_connection()
+                await connection.driver_connection.copy_records_to_table(
+                    Article.__tablename__, columns=columns, records=[[row[c] for c in columns] for row in rows])
+            else:
+                await db.execute(insert(Article), rows)
+            await db.commit()
+            return len(rows)
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Articles not imported. Error: {e}")
+            raise Exception
+
     @staticmethod
     async def get_article_by_id(article_id: int, db: AsyncSession):
         """Show article by id"""
-        query = select(Article).where(Article.id == article_id)
+        query = lambda_stmt(lambda: select(Article).where(Article.id == article_id))
         result = await db.execute(query)
         return result.scalar_one_or_none()
 
     @staticmethod
-    async def get_user_articles(user_id: int, db: AsyncSession):
-        """Show user's articles"""
-        query = select(Article).where(Article.user_id == user_id)
+    async def get_user_articles(user_id: int, db: AsyncSession, limit: int,
+                                cursor: Optional[Tuple[datetime, int]] = None):
+        """Show a page of user's articles as plain rows"""
+        query = lambda_stmt(lambda: select(*Article.__table__.columns).where(Article.user_id == user_id))
+        query = keyset_page(query, limit=limit, cursor=cursor)
         result = await db.execute(query)
+        return result.all()
+
+    @staticmethod
+    async def get_user_article_ids(user_id: int, db: AsyncSession) -> List[int]:
+        result = await db.execute(lambda_stmt(lambda: select(Article.id).where(Article.user_id == user_id)))
         return result.scalars().all()
 
     @staticmethod
-    async def get_articles(db: AsyncSession):
-        """Show all articles"""
-        result = await db.execute(select(Article))
+    async def get_articles(db: AsyncSession, limit: int, cursor: Optional[Tuple[datetime, int]] = None,
+                           filters: Optional[ArticleFilter] = None, fields: Optional[Sequence[str]] = None):
+        """Show a page of articles matching filters as plain rows, selecting only the columns fields need"""
+        query = keyset_page(filter_articles(select_columns(article_columns(fields)), filters), limit=limit,
+                            cursor=cursor)
+        result = await db.execute(query)
+        return result.all()
+
+    @staticmethod
+    async def get_changes(db: AsyncSession, limit: int, settle: float,
+                          since: Optional[Tuple[datetime, int]] = None):
+        """Articles changed and tombstones left after since, except the last settle seconds by the database
+        clock, each in (changed_at, article id) order; one extra row of each tells if there are more"""
+        until = await db.scalar(select(utcnow())) - timedelta(seconds=settle)
+        articles = select(*Article.__table__.columns).where(Article.updated_at <= until)
+        tombstones = select(ArticleTombstone).where(ArticleTombstone.deleted_at <= until)
+        if since:
+            articles = articles.where(tuple_(Article.updated_at, Article.id) > tuple_(*since))
+            tombstones = tombstones.where(tuple_(ArticleTombstone.deleted_at, ArticleTombstone.article_id) >
+                                          tuple_(*since))
+        articles = articles.order_by(Article.updated_at, Article.id).limit(limit + 1)
+        tombstones = tombstones.order_by(ArticleTombstone.deleted_at, ArticleTombstone.article_id).limit(limit + 1)
+        return (await db.execute(articles)).all(), (await db.execute(tombstones)).scalars().all()
+
+    @staticmethod
+    async def search_articles(q: str, db: AsyncSession, limit: int):
+        """Show articles most relevant to q"""
+        query = search_query(q, dialect=db.bind.dialect.name).limit(limit)
+        result = await db.execute(query)
         return result.scalars().all()
 
     @staticmethod
-    async def delete_article(article_id: int, db: AsyncSession):
-        """Delete article by id"""
-        query = delete(Article).where(Article.id == article_id)
-        await db.execute(query)
+    async def stream_articles(db: AsyncSession, batch_size: int):
+        """Iterate over all articles in batches through a server-side cursor, skipping ORM hydration"""
+        query = select(*Article.__table__.columns).order_by(Article.id).execution_options(yield_per=batch_size)
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            yield rows
+
+    @staticmethod
+    async def delete_article(article_id: int, db: AsyncSession, user_id: int) -> bool:
+        """Delete user's article by id in one statement, leaving a tombstone for the change feed;
+        False if there is no such article of this user"""
+        query = lambda_stmt(lambda: delete(Article).where(Article.id == article_id, Article.user_id == user_id))
+        result = await db.execute(query)
+        if result.rowcount:
+            await db.execute(insert(ArticleTombstone).values(article_id=article_id, user_id=user_id))
         await db.commit()
+        if not result.rowcount:
+            return False
         logger.info(f"Article with {article_id} deleted")
-        return {'Article deleted'}
+        return True
 
     @staticmethod
-    async def update_article(article: ArticlePatch, article_id: int, db: AsyncSession):
-        """Partial update of article instance in DB"""
+    async def update_article(article: ArticlePatch, article_id: int, db: AsyncSession, user_id: int):
+        """Partial update of user's article, returning the new row (None if there is no such article of this user)"""
         try:
-            update_data = article.dict(exclude_unset=True)
-            updated_article = update(Article).where(Article.id == article_id).values(**update_data)
-            await db.execute(updated_article)
+            update_data = dict(article.dict(exclude_unset=True), updated_at=utcnow(),
+                               version=Article.version + 1)
+            query = update(Article).where(Article.id == article_id, Article.user_id == user_id).values(**update_data)
+            if db.bind.dialect.full_returning:
+                result = await db.execute(query.returning(*Article.__table__.columns))
+                updated_article = result.one_or_none()
+            else:
+                result = await db.execute(query)
+                updated_article = await DBArticleController.get_article_by_id(article_id=article_id, db=db) \
+                    if result.rowcount else None
             await db.commit()
-            logger.info(f"Article {article_id} updated")
-            result = await db.execute(select(Article).where(Article.id == article_id))  # !!!!!!!!!!!!!!!!
-            return result.scalar_one_or_none()
+            if updated_article:
+                logger.info(f"Article {article_id} updated")
+            return updated_article
         except exc.SQLAlchemyError as e:
             logger.error(f"Article not updated. Error: {e._message()}")
             raise Exception
-
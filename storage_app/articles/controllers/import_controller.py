@@ -0,0 +1,134 @@
+import csv
+import json
+from typing import AsyncIterator, Tuple, Union
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from storage_app.articles.controllers.article_cache import invalidate_articles
+from storage_app.articles.controllers.db_article_controller import DBArticleController
+from storage_app.articles.models.api_article_models import ArticleCreate, Category, Language
+from storage_app.logger_config import logger
+
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportRowError(ValueError):
+    """The database rejected a chunk of validated rows; imported is the count written before it"""
+
+    def __init__(self, message: str, imported: int):
+        super().__init__(message)
+        self.imported = imported
+
+
+def decode_line(line: bytes) -> Union[str, UnicodeDecodeError]:
+    try:
+        return line.decode('utf8').rstrip('\r')
+    except UnicodeDecodeError as e:
+        return e
+
+
+async def read_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Union[str, UnicodeDecodeError]]:
+    """Split a byte stream into text lines without holding more than one line in memory; a line that
+    isn't UTF-8 comes as its decoding error, for the parser to report like any other invalid record"""
+    pending = b''
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            yield decode_line(line)
+    if pending:
+        yield decode_line(pending)
+
+
+async def parse_ndjson(lines: AsyncIterator[Union[str, UnicodeDecodeError]]) -> AsyncIterator[Tuple[int, object]]:
+    number = 0
+    async for line in lines:
+        number += 1
+        if isinstance(line, UnicodeDecodeError):
+            yield number, line
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, e
+
+
+async def parse_csv(lines: AsyncIterator[Union[str, UnicodeDecodeError]]) -> AsyncIterator[Tuple[int, object]]:
+    """Header line names the fields; a record continues over lines while its quotes are unbalanced.
+    A line that isn't UTF-8 invalidates the record it is part of"""
+    header, record, number, start = None, [], 0, 0
+    async for line in lines:
+        number += 1
+        if not record:
+            start = number
+        if isinstance(line, UnicodeDecodeError):
+            record = []
+            yield start, line
+            continue
+        record.append(line)
+        text = '\n'.join(record)
+        if text.count('"') % 2:
+            continue
+        record = []
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = values
+            continue
+        yield start, {field: value for field, value in zip(header, values) if value != ''}
+
+
+def to_row(article: ArticleCreate, user_id: int) -> dict:
+    """Column values ready for both COPY and INSERT: enums by name, url as text; timestamps come from the DB clock"""
+    return {
+        'title': article.title,
+        'brief_description': article.brief_description,
+        'category': Category(article.category).name,
+        'language': Language(article.language).name,
+        'url': str(article.url) if article.url else None,
+        'file': article.file,
+        'user_id': user_id,
+    }
+
+
+class ImportController:
+    @staticmethod
+    async def import_articles(lines: AsyncIterator[str], fmt: str, db: AsyncSession, user_id: int,
+                              chunk_size: int = 5000) -> dict:
+        """Validate records one by one with ArticleCreate rules and write valid ones in chunks"""
+        records = parse_csv(lines) if fmt == 'csv' else parse_ndjson(lines)
+        imported, invalid, errors, chunk = 0, 0, [], []
+        try:
+            async for line, record in records:
+                try:
+                    if isinstance(record, Exception):
+                        raise ValueError(str(record))
+                    chunk.append(to_row(ArticleCreate.parse_obj(record), user_id=user_id))
+                except (ValidationError, ValueError, TypeError) as e:
+                    invalid += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        details = e.errors() if isinstance(e, ValidationError) else [{'msg': str(e)}]
+                        errors.append({'line': line, 'errors': details})
+                    continue
+                if len(chunk) >= chunk_size:
+                    imported += await ImportController.write_chunk(chunk, db=db, imported=imported)
+                    chunk = []
+            if chunk:
+                imported += await ImportController.write_chunk(chunk, db=db, imported=imported)
+        finally:
+            if imported:
+                await invalidate_articles(user_id)
+        logger.info(f"{imported} articles imported, {invalid} rejected")
+        return {'imported': imported, 'invalid': invalid, 'errors': errors}
+
+    @staticmethod
+    async def write_chunk(chunk: list, db: AsyncSession, imported: int) -> int:
+        try:
+            return await DBArticleController.copy_articles(rows=chunk, db=db)
+        except Exception:
+            raise ImportRowError(f"Import stopped after {imported} articles: the database rejected the next "
+                                 f"{len(chunk)} rows", imported=imported)
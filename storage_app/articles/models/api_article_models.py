@@ -1,15 +1,24 @@
 import datetime
 from enum import Enum
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, HttpUrl, validator
 
 
-class Language(int, Enum):
+class IntChoice(int, Enum):
+    @classmethod
+    def _missing_(cls, value):
+        """Query parameters carry members as digit strings"""
+        if isinstance(value, str) and value.isdigit():
+            return cls(int(value))
+        return None
+
+
+class Language(IntChoice):
     ENGLISH = 1
     RUSSIAN = 2
 
 
-class Category(int, Enum):
+class Category(IntChoice):
     DEVOPS = 1
     PYTHON = 2
     TESTING = 3
@@ -54,6 +63,37 @@ class ArticleOut(ArticleCreate):
         arbitrary_types_allowed = True
 
 
+class ArticleRecord(ArticleOut):
+    """Article as kept in cache: ArticleOut plus updated_at for conditional requests"""
+    updated_at: datetime.datetime
+
+
+class ArticleRecordPage(BaseModel):
+    items: List[ArticleRecord]
+    next_cursor: Optional[str] = None
+
+
+class ChangeType(str, Enum):
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+
+
+class ArticleChange(BaseModel):
+    """One entry of the change feed; article is the current state, None for deleted ones"""
+    id: int
+    change: ChangeType
+    changed_at: datetime.datetime
+    version: Optional[int] = None
+    article: Optional[ArticleRecord] = None
+
+
+class ArticleChangeFeed(BaseModel):
+    items: List[ArticleChange]
+    next_cursor: Optional[str] = None
+    has_more: bool
+
+
 class ArticlePatch(BaseModel):
     title: str = None
     brief_description: Optional[str] = None
@@ -61,3 +101,44 @@ class ArticlePatch(BaseModel):
     language: Language = None
     url: Optional[HttpUrl] = None
     file: Optional[str] = None
+
+
+class ArticleFilter(BaseModel):
+    category: Optional[Category] = None
+    language: Optional[Language] = None
+    user_id: Optional[int] = None
+    created_after: Optional[datetime.datetime] = None
+    created_before: Optional[datetime.datetime] = None
+
+    @validator('created_after', 'created_before')
+    def validate_bounds(cls, value):
+        """DB keeps naive UTC: an aware bound is converted to it, a naive one is taken as UTC already"""
+        if value is not None and value.tzinfo is not None:
+            return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return value
+
+
+class ArticlePage(BaseModel):
+    items: List[ArticleOut]
+    next_cursor: Optional[str] = None
+
+
+class ArticleBatchError(BaseModel):
+    index: int
+    errors: List[Dict[str, Any]]
+
+
+class ArticleBatchResult(BaseModel):
+    created: List[ArticleOut]
+    errors: List[ArticleBatchError]
+
+
+class ArticleImportError(BaseModel):
+    line: int
+    errors: List[Dict[str, Any]]
+
+
+class ArticleImportResult(BaseModel):
+    imported: int
+    invalid: int
+    errors: List[ArticleImportError]
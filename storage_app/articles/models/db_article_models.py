@@ -1,11 +1,10 @@
-from datetime import datetime
 import enum
 
-from sqlalchemy import Column, Text, Integer, String, ForeignKey, DateTime, Enum
+from sqlalchemy import Column, Text, Integer, String, ForeignKey, DateTime, Enum, Index, DDL, event
 from sqlalchemy.orm import relationship
 from sqlalchemy_utils import URLType
 
-from storage_app.db_config import Base
+from storage_app.db_config import Base, utcnow
 
 
 class Language(enum.IntEnum):
@@ -33,8 +32,65 @@ class Article(Base):
     language = Column(Enum(Language), nullable=False)
     url = Column(URLType, nullable=True)
     file = Column(String, nullable=True)
-    created_at = Column(DateTime, default=datetime.now, nullable=False)
-    updated_at = Column(DateTime, default=datetime.now, nullable=False)
+    # Naive UTC by the database clock, which orders the change feed
+    created_at = Column(DateTime, default=utcnow(), nullable=False)
+    updated_at = Column(DateTime, default=utcnow(), onupdate=utcnow(), nullable=False)
+    version = Column(Integer, default=1, server_default='1', nullable=False)
     user_id = Column(Integer, ForeignKey("users.id", ondelete='CASCADE'), nullable=False)
 
     creator = relationship("User", back_populates="articles")
+
+    __table_args__ = (
+        Index('ix_articles_created_at_id', 'created_at', 'id'),
+        Index('ix_articles_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+        Index('ix_articles_category_created_at_id', 'category', 'created_at', 'id'),
+        Index('ix_articles_language_created_at_id', 'language', 'created_at', 'id'),
+        Index('ix_articles_updated_at_id', 'updated_at', 'id'),
+    )
+
+
+class ArticleTombstone(Base):
+    """Deleted article as seen by the change feed; user_id has no foreign key, the user may be gone too"""
+    __tablename__ = "article_tombstones"
+
+    id = Column(Integer, primary_key=True)
+    article_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=utcnow(), nullable=False)
+
+    __table_args__ = (
+        Index('ix_article_tombstones_deleted_at_article_id', 'deleted_at', 'article_id'),
+    )
+
+
+# Full-text search lives outside the mapped columns: a generated tsvector with GIN index on PostgreSQL
+# and an external-content FTS5 table kept in sync by triggers on SQLite
+PG_SEARCH_DDL = (
+    "ALTER TABLE articles ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "to_tsvector(CASE WHEN language = 'RUSSIAN' THEN 'russian'::regconfig ELSE 'english'::regconfig END, "
+    "coalesce(title, '') || ' ' || coalesce(brief_description, ''))) STORED",
+    "CREATE INDEX ix_articles_search_vector ON articles USING gin (search_vector)",
+)
+
+SQLITE_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5("
+    "title, brief_description, content='articles', content_rowid='id')",
+    "CREATE TRIGGER articles_fts_ai AFTER INSERT ON articles BEGIN "
+    "INSERT INTO articles_fts(rowid, title, brief_description) VALUES (new.id, new.title, new.brief_description); "
+    "END",
+    "CREATE TRIGGER articles_fts_ad AFTER DELETE ON articles BEGIN "
+    "INSERT INTO articles_fts(articles_fts, rowid, title, brief_description) "
+    "VALUES ('delete', old.id, old.title, old.brief_description); "
+    "END",
+    "CREATE TRIGGER articles_fts_au AFTER UPDATE ON articles BEGIN "
+    "INSERT INTO articles_fts(articles_fts, rowid, title, brief_description) "
+    "VALUES ('delete', old.id, old.title, old.brief_description); "
+    "INSERT INTO articles_fts(rowid, title, brief_description) VALUES (new.id, new.title, new.brief_description); "
+    "END",
+)
+
+for statement in PG_SEARCH_DDL:
+    event.listen(Article.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(Article.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(Article.__table__, 'before_drop', DDL("DROP TABLE IF EXISTS articles_fts").execute_if(dialect='sqlite'))
@@ -1,12 +1,25 @@
-from typing import List
+from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from storage_app.articles.controllers.api_article_controller import APIArticleController
-from storage_app.articles.models.api_article_models import ArticleCreate, ArticleOut, ArticlePatch
-from storage_app.authentication.views.authentication_views import get_current_user
-from storage_app.db_config import get_db
+from storage_app.articles.controllers.api_article_controller import APIArticleController, requested_fields
+from storage_app.articles.controllers.article_events import article_events
+from storage_app.articles.controllers.import_controller import ImportController, ImportRowError, read_lines
+from storage_app.articles.models.api_article_models import ArticleBatchResult, ArticleChangeFeed, ArticleCreate, \
+    ArticleFilter, ArticleImportResult, ArticleOut, ArticlePage, ArticlePatch
+from storage_app.authentication.views.authentication_views import get_admin_user, get_current_user
+from storage_app.conditional import is_not_modified, make_etag, not_modified, set_validators
+from storage_app.config import SETTINGS
+from storage_app.db_config import get_db, get_read_db
+from storage_app.events import sse_stream
+from storage_app.fieldsets import FIELDS_DESCRIPTION
+from storage_app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from storage_app.responses import ARTICLE_FIELDS, orjson_response, page_response, row_payload
+
+MAX_BATCH_SIZE = 1000
+CHANGES_SINCE_DESCRIPTION = "next_cursor of the previous call; without it the feed starts from the first article"
 
 router = APIRouter(
     prefix='/articles',
@@ -20,15 +33,81 @@ async def create_new_article(article: ArticleCreate, db: AsyncSession = Depends(
     return await APIArticleController.create_article(article=article, db=db, user_id=user_id)
 
 
+@router.post("/batch", response_model=ArticleBatchResult, status_code=201)
+async def create_articles_batch(articles: List[Dict[str, Any]] = Body(..., min_items=1, max_items=MAX_BATCH_SIZE),
+                                db: AsyncSession = Depends(get_db), user_id: int = Depends(get_current_user)):
+    return await APIArticleController.create_articles(items=articles, db=db, user_id=user_id)
+
+
+@router.post("/import", response_model=ArticleImportResult, status_code=201)
+async def import_articles(request: Request, format: str = Query('ndjson', regex='^(ndjson|csv)$'),
+                          owner_id: Optional[int] = Query(None, alias='user_id'),
+                          db: AsyncSession = Depends(get_db), user_id: int = Depends(get_admin_user)):
+    try:
+        return await ImportController.import_articles(lines=read_lines(request.stream()), fmt=format, db=db,
+                                                      user_id=owner_id or user_id)
+    except ImportRowError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+
+@router.get("/search", response_model=List[ArticleOut])
+async def search_articles(q: str = Query(..., min_length=1, max_length=200),
+                          limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                          db: AsyncSession = Depends(get_read_db), user_id: int = Depends(get_current_user)):
+    return await APIArticleController.search_articles(q=q, db=db, limit=limit)
+
+
+@router.get("/export")
+async def export_articles(db: AsyncSession = Depends(get_read_db), user_id: int = Depends(get_current_user)):
+    return StreamingResponse(APIArticleController.export_articles(db=db), media_type='application/x-ndjson')
+
+
+@router.get("/events")
+async def stream_article_events(db: AsyncSession = Depends(get_db), user_id: int = Depends(get_current_user)):
+    # The stream outlives the request's dependencies: give back the connection authentication used
+    await db.close()
+    return StreamingResponse(sse_stream(article_events, heartbeat=SETTINGS.ARTICLE_EVENTS_HEARTBEAT_SECONDS),
+                             media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# Reads from primary: a lagging replica could let the cursor pass changes it hasn't replayed yet
+@router.get("/changes", response_model=ArticleChangeFeed)
+async def show_article_changes(since: Optional[str] = Query(None, description=CHANGES_SINCE_DESCRIPTION),
+                               limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                               db: AsyncSession = Depends(get_db), user_id: int = Depends(get_current_user)):
+    return await APIArticleController.get_changes(db=db, limit=limit, since=since)
+
+
 @router.get("/{article_id}", response_model=ArticleOut)
-async def show_user(article_id: int, db: AsyncSession = Depends(get_db),
-                    user_id: int = Depends(get_current_user)):
-    return await APIArticleController.get_article(article_id=article_id, db=db)
+async def show_user(article_id: int, request: Request, response: Response,
+                    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+                    db: AsyncSession = Depends(get_read_db), user_id: int = Depends(get_current_user)):
+    selected = requested_fields(fields)
+    article = await APIArticleController.get_article(article_id=article_id, db=db)
+    etag = make_etag([article], *(selected or ()))
+    if is_not_modified(request, etag, article.updated_at):
+        return not_modified(response, etag, article.updated_at)
+    set_validators(response, etag, article.updated_at)
+    if selected:
+        return orjson_response(row_payload(article, selected), response)
+    return article
 
 
-@router.get("/", response_model=List[ArticleOut])
-async def show_articles(db: AsyncSession = Depends(get_db), user_id: int= Depends(get_current_user)):
-    return await APIArticleController.get_articles(db=db)
+@router.get("/", response_model=ArticlePage)
+async def show_articles(request: Request, response: Response,
+                        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                        filters: ArticleFilter = Depends(),
+                        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+                        db: AsyncSession = Depends(get_read_db), user_id: int= Depends(get_current_user)):
+    selected = requested_fields(fields)
+    page = await APIArticleController.get_articles(db=db, limit=limit, cursor=cursor, filters=filters,
+                                                   fields=selected)
+    etag = make_etag(page['items'], page['next_cursor'], *(selected or ()))
+    if is_not_modified(request, etag):
+        return not_modified(response, etag)
+    set_validators(response, etag)
+    return page_response(page, response, selected or ARTICLE_FIELDS)
 
 
 @router.patch("/{article_id}", status_code=202, response_model=ArticleOut)
@@ -1,13 +1,68 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
+from storage_app.config import SETTINGS
+
 password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
+class HashingPoolSaturated(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Server is busy, repeat request later",
+                         headers={"Retry-After": "1"})
+
+
+class HashingPool:
+    """Runs bcrypt in worker threads, rejecting work beyond workers + queue_limit instead of piling it up"""
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.in_flight = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+
+    async def run(self, func, *args):
+        """A cancelled caller stops waiting, but its call keeps its slot until the worker thread is done with it"""
+        if self.in_flight >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HashingPoolSaturated
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        future = self._executor.submit(func, *args)
+
+        def release(_):
+            # Runs in the worker thread: the counter is only touched on the loop
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self._release)
+
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self):
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'queue_limit': self.queue_limit,
+            'busy': min(self.in_flight, self.workers),
+            'queued': max(self.in_flight - self.workers, 0),
+            'rejected': self.rejected,
+        }
+
+
+hashing_pool = HashingPool(workers=SETTINGS.PASSWORD_HASH_WORKERS, queue_limit=SETTINGS.PASSWORD_HASH_QUEUE_LIMIT)
+
+
 class PasswordController:
     @staticmethod
-    def verify_password(plain_password: str, hashed_password: str) -> bool:
-        return password_context.verify(plain_password, hashed_password)
+    async def verify_password(plain_password: str, hashed_password: str) -> bool:
+        return await hashing_pool.run(password_context.verify, plain_password, hashed_password)
 
     @staticmethod
-    def generate_hashed_password(password: str) -> str:
-        return password_context.hash(password)
\ No newline at end of file
+    async def generate_hashed_password(password: str) -> str:
+        return await hashing_pool.run(password_context.hash, password)
@@ -0,0 +1,96 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from storage_app.authentication.models.db_revoked_tokens import RevokedToken
+from storage_app.config import SETTINGS
+from storage_app.db_config import SessionLocal
+from storage_app.logger_config import logger
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def posix(moment: datetime) -> float:
+    """DB keeps naive UTC datetimes, token claims are POSIX timestamps"""
+    return (moment - EPOCH).total_seconds()
+
+
+class RevocationList:
+    """In-memory mirror of revoked_tokens, so verifying a token needs no DB round trip"""
+
+    def __init__(self):
+        self.jtis: Dict[str, float] = {}
+        self.users: Dict[int, float] = {}
+
+    def is_revoked(self, payload: dict) -> bool:
+        if payload.get('jti') in self.jtis:
+            return True
+        revoked_at = self.users.get(payload.get('uid'))
+        return revoked_at is not None and payload.get('iat', 0) < revoked_at
+
+    def add(self, token: RevokedToken):
+        if token.jti == f'user:{token.user_id}':
+            self.users[token.user_id] = posix(token.revoked_at)
+        else:
+            self.jtis[token.jti] = posix(token.expires_at)
+
+    def clear(self):
+        self.jtis.clear()
+        self.users.clear()
+
+
+revocation_list = RevocationList()
+
+
+class RevocationController:
+    @staticmethod
+    async def revoke_token(payload: dict, db: AsyncSession):
+        """Revoke single token by its jti until it expires anyway"""
+        if not payload.get('jti'):
+            return
+        token = RevokedToken(jti=payload['jti'], user_id=payload.get('uid'), revoked_at=datetime.utcnow(),
+                             expires_at=datetime.utcfromtimestamp(payload['exp']))
+        await db.merge(token)
+        await db.commit()
+        revocation_list.add(token)
+        logger.info("token revoked")
+
+    @staticmethod
+    async def revoke_user_tokens(user_id: int, db: AsyncSession) -> RevokedToken:
+        """Revoke every token of user issued up to now; the caller commits"""
+        now = datetime.utcnow()
+        lifetime = max(SETTINGS.ACCESS_TOKEN_EXPIRE_MINUTES, SETTINGS.REFRESH_TOKEN_EXPIRE_MINUTES)
+        token = RevokedToken(jti=f'user:{user_id}', user_id=user_id, revoked_at=now,
+                             expires_at=now + timedelta(minutes=lifetime))
+        return await db.merge(token)
+
+    @staticmethod
+    def apply(token: RevokedToken):
+        """Make committed revocation visible to this worker immediately"""
+        revocation_list.add(token)
+
+    @staticmethod
+    async def load(db: AsyncSession):
+        """Drop expired revocations and reload the rest into memory"""
+        now = datetime.utcnow()
+        await db.execute(delete(RevokedToken).where(RevokedToken.expires_at < now))
+        await db.commit()
+        result = await db.execute(select(RevokedToken))
+        fresh = RevocationList()
+        for token in result.scalars():
+            fresh.add(token)
+        revocation_list.jtis, revocation_list.users = fresh.jtis, fresh.users
+
+    @staticmethod
+    async def sync_forever():
+        """Pick up revocations made by other workers"""
+        while True:
+            try:
+                async with SessionLocal() as db:
+                    await RevocationController.load(db=db)
+            except Exception as e:
+                logger.error(f"Revocation list not synced. Error: {e}")
+            await asyncio.sleep(SETTINGS.REVOCATION_SYNC_SECONDS)
@@ -1,12 +1,23 @@
+import time
+import uuid
 from typing import Union
 from datetime import datetime, timedelta
 
 from jose import jwt, JWTError, ExpiredSignatureError
 
+from storage_app.authentication.controllers.revocation_controller import revocation_list
 from storage_app.config import SETTINGS
 from storage_app.logger_config import logger
 
 
+def decode_token(token: str) -> Union[dict, None]:
+    """Claims of a valid token, None if it is expired or forged"""
+    try:
+        return jwt.decode(token, SETTINGS.SECRET_KEY, algorithms=[SETTINGS.ALGORITHM])
+    except JWTError:
+        return None
+
+
 class AccessTokenController:
     @staticmethod
     async def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None):
@@ -15,21 +26,23 @@ class AccessTokenController:
             expire = datetime.utcnow() + expires_delta
         else:
             expire = datetime.utcnow() + timedelta(SETTINGS.ACCESS_TOKEN_EXPIRE_MINUTES)
-        to_encode.update({"exp": expire})
+        to_encode.update({"exp": expire, "iat": time.time(), "jti": uuid.uuid4().hex})
         new_access_token = jwt.encode(to_encode, SETTINGS.SECRET_KEY, algorithm=SETTINGS.ALGORITHM)
         logger.info("new access token created")
         return new_access_token
 
     @staticmethod
-    async def verify_access_token(access_token_cookie: str):
+    async def verify_access_token(access_token_cookie: str) -> dict:
         try:
             payload = jwt.decode(access_token_cookie, SETTINGS.SECRET_KEY, algorithms=[SETTINGS.ALGORITHM])
-            username: str = payload.get("sub")
         except ExpiredSignatureError:
             logger.warning("access token time expired")
             raise ExpiredSignatureError
-        logger.info("access token successfully verified")
-        return username
+        if revocation_list.is_revoked(payload):
+            logger.warning("revoked access token used")
+            raise JWTError
+        logger.debug("access token successfully verified")
+        return payload
 
 
 class RefreshTokenController:
@@ -40,7 +53,7 @@ class RefreshTokenController:
             expire = datetime.utcnow() + expires_delta
         else:
             expire = datetime.utcnow() + timedelta(SETTINGS.ACCESS_TOKEN_EXPIRE_MINUTES)
-        to_encode.update({"exp": expire})
+        to_encode.update({"exp": expire, "iat": time.time(), "jti": uuid.uuid4().hex})
         new_refresh_token = jwt.encode(to_encode, SETTINGS.SECRET_KEY, algorithm=SETTINGS.ALGORITHM)
         logger.info("new refresh token created")
         return new_refresh_token
@@ -50,14 +63,19 @@ class RefreshTokenController:
         try:
             payload = jwt.decode(refresh_token_cookie, SETTINGS.SECRET_KEY,
                                  algorithms=[SETTINGS.ALGORITHM])
+            if revocation_list.is_revoked(payload):
+                logger.warning("revoked refresh token used")
+                raise JWTError
             logger.info("refresh token successfully verified")
+            claims = {"sub": payload.get('sub'), "uid": payload.get('uid')}
             access_token_expires = timedelta(minutes=SETTINGS.ACCESS_TOKEN_EXPIRE_MINUTES)
             refresh_token_expires = timedelta(minutes=SETTINGS.REFRESH_TOKEN_EXPIRE_MINUTES)
-            access_token = await AccessTokenController.create_access_token(data={"sub": payload.get('sub')},
+            access_token = await AccessTokenController.create_access_token(data=claims,
                                                                            expires_delta=access_token_expires)
-            refresh_token = await RefreshTokenController.create_refresh_token(data={"sub": payload.get('sub')},
+            refresh_token = await RefreshTokenController.create_refresh_token(data=claims,
                                                                               expires_delta=refresh_token_expires)
         except JWTError:
             logger.warning("refresh token time expired")
             raise JWTError
-        return {"access_token": access_token, "refresh_token": refresh_token, "username": payload.get('sub')}
+        return {"access_token": access_token, "refresh_token": refresh_token, "username": payload.get('sub'),
+                "uid": payload.get('uid')}
@@ -0,0 +1,15 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, DateTime
+
+from storage_app.db_config import Base
+
+
+class RevokedToken(Base):
+    """Revoked jti, or 'user:<id>' revoking every token of that user issued before revoked_at"""
+    __tablename__ = 'revoked_tokens'
+
+    jti = Column(String, primary_key=True)
+    user_id = Column(Integer, nullable=True)
+    revoked_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
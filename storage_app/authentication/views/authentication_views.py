@@ -7,13 +7,16 @@ from jose import JWTError, ExpiredSignatureError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from storage_app.authentication.models.token import Token
-from storage_app.authentication.controllers.token_controller import AccessTokenController, RefreshTokenController
+from storage_app.authentication.controllers.revocation_controller import RevocationController
+from storage_app.authentication.controllers.token_controller import AccessTokenController, RefreshTokenController, \
+    decode_token
 from storage_app.authentication.controllers.password_controller import PasswordController
 from storage_app.config import SETTINGS
 from storage_app.db_config import get_db
 from storage_app.users.controllers.db_user_controller import DBUserController
 from storage_app.users.models.api_users import UserCreate
 from storage_app.logger_config import logger
+from storage_app.metrics import token_refreshes
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -23,16 +26,16 @@ router = APIRouter(
 )
 
 async def authenticate_user(user_form: UserCreate, db: AsyncSession):
-    user = await DBUserController.get_user_by_username(username=user_form.username, db=db)
+    user = await DBUserController.get_user_credentials(username=user_form.username, db=db)
     if not user:
         return False
-    if not PasswordController.verify_password(user_form.password, user.password):
+    if not await PasswordController.verify_password(user_form.password, user.password):
         return False
     return user
 
 
 async def get_current_user(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
-    """Get user from access token if found"""
+    """Get user id from access token; only tokens issued before the uid claim need a DB lookup"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -42,26 +45,39 @@ async def get_current_user(request: Request, response: Response, db: AsyncSessio
     if not access_token_cookie:
         raise HTTPException(status_code=401)
     try:
-        username = await AccessTokenController.verify_access_token(access_token_cookie=access_token_cookie)
+        payload = await AccessTokenController.verify_access_token(access_token_cookie=access_token_cookie)
+        username, uid = payload.get("sub"), payload.get("uid")
     except ExpiredSignatureError:
         refresh_token_cookie: str = request.cookies.get('refresh_token')
         if not request.cookies.get('refresh_token'):
             raise HTTPException(status_code=401)
         try:
             data: dict = await RefreshTokenController.verify_refresh_token(refresh_token_cookie=refresh_token_cookie)
-            username = data.get("username")
+            username, uid = data.get("username"), data.get("uid")
             response.set_cookie(key="access_token", value=data.get("access_token"), httponly=True)
             response.set_cookie(key="refresh_token", value=data.get("refresh_token"), httponly=True)
+            token_refreshes.inc('ok')
         except JWTError:
+            token_refreshes.inc('rejected')
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+    if uid is not None:
+        return uid
     user = await DBUserController.get_user_by_username(username=username, db=db)
     if user is None:
         raise credentials_exception
     return user.id
 
 
+async def get_admin_user(user_id: int = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """Get id of current user if it is listed in ADMIN_USERNAMES"""
+    user = await DBUserController.get_user_by_id(user_id=user_id, db=db)
+    if user is None or user.username not in SETTINGS.ADMIN_USERNAMES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='You are not allowed to perform this action')
+    return user.id
+
+
 @router.post("/login", response_model=Token)
 async def login(response: Response, form_data: OAuth2PasswordRequestForm = Depends(),
                 db: AsyncSession = Depends(get_db)):
@@ -76,9 +92,9 @@ async def login(response: Response, form_data: OAuth2PasswordRequestForm = Depen
         )
     access_token_expires = timedelta(minutes=SETTINGS.ACCESS_TOKEN_EXPIRE_MINUTES)
     refresh_token_expires = timedelta(minutes=SETTINGS.REFRESH_TOKEN_EXPIRE_MINUTES)
-    access_token = await AccessTokenController.create_access_token(data={"sub": user_form.username},
-                                                                   expires_delta=access_token_expires)
-    refresh_token = await RefreshTokenController.create_refresh_token(data={"sub": user_form.username},
+    claims = {"sub": user_form.username, "uid": user.id}
+    access_token = await AccessTokenController.create_access_token(data=claims, expires_delta=access_token_expires)
+    refresh_token = await RefreshTokenController.create_refresh_token(data=claims,
                                                                       expires_delta=refresh_token_expires)
     response.set_cookie(key="access_token", value=access_token, httponly=True)
     response.set_cookie(key="refresh_token", value=refresh_token, httponly=True)
@@ -87,7 +103,11 @@ async def login(response: Response, form_data: OAuth2PasswordRequestForm = Depen
 
 
 @router.get("/logout")
-async def logout(response: Response):
+async def logout(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    for cookie in ('access_token', 'refresh_token'):
+        payload = decode_token(request.cookies.get(cookie, ''))
+        if payload:
+            await RevocationController.revoke_token(payload=payload, db=db)
     response.delete_cookie(key="access_token")
     response.delete_cookie(key="refresh_token")
     logger.info("User logged-out")
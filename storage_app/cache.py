@@ -0,0 +1,266 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple, Type
+
+from pydantic import BaseModel
+
+from storage_app.logger_config import logger
+from storage_app.singleflight import SingleFlight
+
+
+class TTLCache:
+    """Bounded in-process LRU cache whose entries expire ttl seconds after being stored"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def evict(self, predicate: Callable[[Any], bool]):
+        """Drop every entry whose value matches predicate"""
+        for key in [key for key, (_, value) in self._data.items() if predicate(value)]:
+            del self._data[key]
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {'size': len(self._data), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+class MemoryBackend:
+    """Default cache backend: entries live in this worker's TTLCache.
+
+    Counters are forgotten counter_ttl seconds after their last incr, which has to be at least the
+    lifetime of an entry (ttl + stale_ttl): by then no entry keyed by an older value is left. New
+    values are never below the current time in ns, so a counter that was forgotten doesn't hand out
+    a value it used before.
+    """
+
+    def __init__(self, maxsize: int, counter_ttl: float):
+        self._entries = TTLCache(maxsize=maxsize, ttl=0)
+        self.counter_ttl = counter_ttl
+        self._counters: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, fresh_until: float, value: Any, ttl: float):
+        self._entries.ttl = ttl
+        self._entries.set(key, (fresh_until, value))
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key)
+
+    async def counter(self, key: str) -> int:
+        entry = self._counters.get(key)
+        return entry[1] if entry and entry[0] > time.monotonic() else 0
+
+    async def incr(self, key: str):
+        now = time.monotonic()
+        # Insertion order is expiry order: drop the expired ones from the front
+        while self._counters:
+            oldest = next(iter(self._counters))
+            if self._counters[oldest][0] > now:
+                break
+            del self._counters[oldest]
+        value = max(await self.counter(key) + 1, time.time_ns())
+        self._counters[key] = (now + self.counter_ttl, value)
+        self._counters.move_to_end(key)
+
+    async def clear(self):
+        self._entries.clear()
+        self._counters.clear()
+
+
+class RedisBackend:
+    """Cache backend on any client with redis.asyncio get/set/delete/incr coroutines.
+
+    Values are pydantic models stored as JSON; models maps key prefix (up to the first ':') to the model class.
+    """
+
+    def __init__(self, client, models: Dict[str, Type[BaseModel]]):
+        self.client = client
+        self.models = models
+
+    @classmethod
+    def from_url(cls, url: str, models: Dict[str, Type[BaseModel]]):
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError("Install redis package to use Redis cache backend")
+        return cls(redis.from_url(url), models)
+
+    async def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        raw = await self.client.get(key)
+        if raw is None:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode('utf8')
+        fresh_until, value = raw.split('|', 1)
+        return float(fresh_until), self.models[key.split(':', 1)[0]].parse_raw(value)
+
+    async def set(self, key: str, fresh_until: float, value: BaseModel, ttl: float):
+        await self.client.set(key, f'{fresh_until}|{value.json()}', ex=max(int(ttl), 1))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*keys)
+
+    async def counter(self, key: str) -> int:
+        return int(await self.client.get(key) or 0)
+
+    async def incr(self, key: str):
+        await self.client.incr(key)
+
+    async def clear(self):
+        await self.client.flushdb()
+
+
+class ReadThroughCache:
+    """Read-through cache with stale-while-revalidate on top of a pluggable backend.
+
+    Entries are fresh for ttl seconds and then served stale for up to stale_ttl more while one background
+    task per key reloads them. Loaders take a DB session; background reloads open their own from
+    session_factory since the request's session is busy or closed by then, and so do misses given no
+    session (a replica session must not be passed: a lagging replica would store a pre-write row for
+    every reader until the entry expires). A load or reload racing
+    with delete() of its key is thrown away so it can't put back what a write just invalidated.
+    Concurrent misses of one key share a single load.
+    """
+
+    def __init__(self, backend, ttl: float, stale_ttl: float, session_factory: Callable, name: str = 'cache'):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.session_factory = session_factory
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._refreshing = set()
+        # The loop only keeps weak references to tasks: running reloads are held here until they finish
+        self._tasks: Set[asyncio.Task] = set()
+        self._loads = SingleFlight(name)
+        # delete() count, and for keys being loaded the count at their last delete()
+        self._deletes = 0
+        self._in_flight: Dict[str, int] = {}
+        self._deleted_at: Dict[str, int] = {}
+
+    async def get_or_load(self, key: str, loader: Callable[[Any], Awaitable[Any]], db):
+        entry = await self.backend.get(key)
+        if entry is not None:
+            fresh_until, value = entry
+            if fresh_until > time.time():
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                self._revalidate(key, loader)
+            return value
+        self.misses += 1
+        return await self._loads.do(key, lambda: self._load(key, loader, db))
+
+    async def _load(self, key: str, loader: Callable[[Any], Awaitable[Any]], db):
+        started = self._start_load(key)
+        try:
+            if db is None:
+                async with self.session_factory() as db:
+                    value = await loader(db)
+            else:
+                value = await loader(db)
+            if value is not None and self._still_valid(key, started):
+                await self.set(key, value)
+            return value
+        finally:
+            self._finish_load(key)
+
+    def _start_load(self, key: str) -> int:
+        self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        return self._deletes
+
+    def _still_valid(self, key: str, started: int) -> bool:
+        """No delete() of key since the load started"""
+        return self._deleted_at.get(key, 0) <= started
+
+    def _finish_load(self, key: str):
+        self._in_flight[key] -= 1
+        if not self._in_flight[key]:
+            del self._in_flight[key]
+            self._deleted_at.pop(key, None)
+
+    async def set(self, key: str, value: Any):
+        await self.backend.set(key, time.time() + self.ttl, value, self.ttl + self.stale_ttl)
+
+    async def delete(self, *keys: str):
+        self._deletes += 1
+        for key in keys:
+            if key in self._in_flight:
+                self._deleted_at[key] = self._deletes
+        await self.backend.delete(*keys)
+
+    async def generation(self, namespace: str) -> int:
+        """Keys built with the current generation of namespace are dropped all at once by bump()"""
+        return await self.backend.counter(f'{namespace}:generation')
+
+    async def bump(self, namespace: str):
+        await self.backend.incr(f'{namespace}:generation')
+
+    def _revalidate(self, key: str, loader: Callable[[Any], Awaitable[Any]]):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        task = asyncio.get_running_loop().create_task(self._reload(key, loader))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _reload(self, key: str, loader: Callable[[Any], Awaitable[Any]]):
+        started = self._start_load(key)
+        try:
+            async with self.session_factory() as db:
+                value = await loader(db)
+            if not self._still_valid(key, started):
+                return
+            if value is None:
+                await self.delete(key)
+            else:
+                await self.set(key, value)
+            self.refreshes += 1
+        except Exception as e:
+            logger.error(f"Cache entry {key} not refreshed. Error: {e}")
+        finally:
+            self._refreshing.discard(key)
+            self._finish_load(key)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'hit_rate': round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
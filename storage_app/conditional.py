@@ -0,0 +1,49 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(items: Iterable, *extra) -> str:
+    """Strong validator over (id, updated_at) of every item, changing with any write to them"""
+    digest = hashlib.blake2b(digest_size=12)
+    for item in items:
+        digest.update(f"{item.id}:{item.updated_at.isoformat()};".encode())
+    for value in extra:
+        digest.update(f"{value};".encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def to_utc(moment: datetime) -> datetime:
+    """DB keeps naive UTC"""
+    return moment.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        tags = {tag.strip()[2:] if tag.strip().startswith('W/') else tag.strip() for tag in if_none_match.split(',')}
+        return '*' in tags or etag in tags
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and last_modified:
+        try:
+            return to_utc(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def set_validators(response: Response, etag: str, last_modified: Optional[datetime] = None):
+    response.headers['ETag'] = etag
+    if last_modified:
+        response.headers['Last-Modified'] = format_datetime(to_utc(last_modified), usegmt=True)
+
+
+def not_modified(response: Response, etag: str, last_modified: Optional[datetime] = None) -> Response:
+    """Empty 304 keeping headers (e.g. refreshed auth cookies) that dependencies put on response"""
+    result = Response(status_code=304)
+    result.raw_headers.extend(response.raw_headers)
+    set_validators(result, etag, last_modified)
+    return result
@@ -1,3 +1,5 @@
+from typing import List, Optional
+
 from pydantic import BaseSettings
 
 
@@ -6,6 +8,7 @@ class Settings(BaseSettings):
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     REFRESH_TOKEN_EXPIRE_MINUTES: int
+    ADMIN_USERNAMES: List[str] = []
 
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
@@ -13,6 +16,52 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str
     POSTGRES_DB: str
 
+    DATABASE_URL: Optional[str] = None
+    DB_REPLICA_URLS: List[str] = []
+    DB_REPLICA_STICKY_SECONDS: float = 5
+    DB_REPLICA_RETRY_SECONDS: float = 30
+
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = -1
+    DB_POOL_PRE_PING: bool = False
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_COMPILED_CACHE_SIZE: int = 500
+
+    USER_CACHE_SIZE: int = 4096
+    USER_CACHE_TTL_SECONDS: float = 30
+
+    ARTICLE_CACHE_URL: Optional[str] = None
+    ARTICLE_CACHE_SIZE: int = 10000
+    ARTICLE_CACHE_TTL_SECONDS: float = 30
+    ARTICLE_CACHE_STALE_SECONDS: float = 300
+
+    # The change feed is ordered by the database clock in UTC, taken when the writing transaction starts,
+    # not when it commits. Holding back this much of the latest changes covers the gap: a write committing
+    # later than this after its timestamp can land behind a client's cursor and is missed by that client
+    CHANGE_FEED_SETTLE_SECONDS: float = 1
+
+    # 'memory' serves subscribers of one process, 'postgres' fans out across workers with LISTEN/NOTIFY
+    ARTICLE_EVENTS_BROKER: str = 'memory'
+    ARTICLE_EVENTS_CHANNEL: str = 'article_events'
+    ARTICLE_EVENTS_QUEUE_SIZE: int = 100
+    ARTICLE_EVENTS_HEARTBEAT_SECONDS: float = 15
+
+    REVOCATION_SYNC_SECONDS: float = 10
+
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_LIMIT: int = 64
+
+    SQL_PROFILER: bool = False
+    SQL_PROFILER_REPEAT_THRESHOLD: int = 2
+
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_BATCH_SIZE: int = 256
+    LOG_FLUSH_SECONDS: float = 0.5
+    LOG_RATE_PER_SITE: float = 20
+    LOG_STDERR_LEVEL: str = 'WARNING'
+
     class Config:
         env_file = '.env'
 
@@ -0,0 +1,77 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Set, TypeVar
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+class BatchLoader(Generic[K, V]):
+    """Collects keys asked for during one event loop tick and resolves them all with one batch_fn call.
+
+    Dispatch is scheduled with call_soon, so it runs once every task that was ready in this tick has had
+    its turn. batch_fn runs in its own task with a list of distinct keys and returns a dict with the values
+    found, missing keys resolve to None. A batch serving several requests gets a DB session of its own
+    from session_factory, i.e. a second pool checkout next to theirs; a batch of one key asked for by a
+    single caller runs on that caller's session instead. Callers wait on a shielded future, so cancelling
+    one of them doesn't cancel the batch.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[K], Any], Awaitable[Dict[K, V]]], session_factory: Callable,
+                 max_batch_size: int = 500):
+        self.batch_fn = batch_fn
+        self.session_factory = session_factory
+        self.max_batch_size = max_batch_size
+        self.loads = 0
+        self.batches = 0
+        self._pending: Dict[K, asyncio.Future] = {}
+        # Session of the caller waiting for a key, None once a second caller waits for it too
+        self._sessions: Dict[K, Any] = {}
+        # The loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def load(self, key: K, db: Any = None) -> Optional[V]:
+        self.loads += 1
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            if not self._pending:
+                loop.call_soon(self._dispatch)
+            future = self._pending[key] = loop.create_future()
+            self._sessions[key] = db
+        else:
+            self._sessions[key] = None
+        return await asyncio.shield(future)
+
+    def _dispatch(self):
+        pending, self._pending = self._pending, {}
+        sessions, self._sessions = self._sessions, {}
+        keys = list(pending)
+        for start in range(0, len(keys), self.max_batch_size):
+            batch = {key: pending[key] for key in keys[start:start + self.max_batch_size]}
+            db = sessions[keys[0]] if len(keys) == 1 else None
+            task = asyncio.ensure_future(self._resolve(batch, db))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, batch: Dict[K, asyncio.Future], db: Any = None):
+        self.batches += 1
+        try:
+            if db is not None:
+                values = await self.batch_fn(list(batch), db)
+            else:
+                async with self.session_factory() as db:
+                    values = await self.batch_fn(list(batch), db)
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+                    # Every waiter may be gone: mark the exception as retrieved
+                    future.exception()
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(values.get(key))
+
+    def stats(self) -> dict:
+        return {'loads': self.loads, 'batches': self.batches, 'pending': len(self._pending),
+                'running': len(self._tasks)}
@@ -0,0 +1,195 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Set
+
+import orjson
+from sqlalchemy import text
+
+from storage_app.logger_config import logger
+
+
+class Subscription:
+    """Bounded queue of encoded events for one subscriber.
+
+    A subscriber that lets the queue fill up is dropped instead of making publishers wait: it gets
+    what is already queued, then get() returns None and the subscriber has to resync.
+    """
+
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = False
+
+    def put(self, data: bytes) -> bool:
+        try:
+            self.queue.put_nowait(data)
+            return True
+        except asyncio.QueueFull:
+            self.dropped = True
+            return False
+
+    def close(self):
+        """Drop the subscriber on the broker's side, waking it up if it waits for an event"""
+        self.dropped = True
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self) -> Optional[bytes]:
+        if self.dropped and self.queue.empty():
+            return None
+        return await self.queue.get()
+
+
+class MemoryBroker:
+    """Fans events out to the subscribers of this process; events are encoded once for all of them"""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.subscribers: Set[Subscription] = set()
+        self.published = 0
+        self.dropped = 0
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, *events: dict):
+        self.published += len(events)
+        for event in events:
+            self.deliver(orjson.dumps(event))
+
+    def deliver(self, data: bytes):
+        for subscription in list(self.subscribers):
+            if not subscription.put(data):
+                self.subscribers.discard(subscription)
+                self.dropped += 1
+
+    def close_all(self):
+        """End every open subscription, so their clients resync from the change feed"""
+        for subscription in self.subscribers:
+            subscription.close()
+        self.subscribers.clear()
+
+    def connected(self) -> bool:
+        return True
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator[Subscription]:
+        subscription = Subscription(self.queue_size)
+        if not self.connected():
+            # Nothing would be delivered: tell the client to resync and retry instead
+            subscription.close()
+        self.subscribers.add(subscription)
+        try:
+            yield subscription
+        finally:
+            self.subscribers.discard(subscription)
+
+    def stats(self) -> dict:
+        return {'subscribers': len(self.subscribers), 'published': self.published, 'dropped': self.dropped}
+
+
+class PostgresBroker(MemoryBroker):
+    """Fans events out across workers: publish is a NOTIFY through the engine, and every process keeps
+    one LISTEN connection of its own (outside the pool) delivering notifications to local subscribers,
+    its own events included. NOTIFY payloads are limited to 8000 bytes, which an article event stays
+    well under.
+
+    When the LISTEN connection is lost, open subscriptions are closed (their clients resync from the
+    change feed) and new ones are closed right away until it is reconnected, retrying with backoff.
+    """
+
+    def __init__(self, engine, channel: str, queue_size: int, reconnect_delay: float = 0.5,
+                 max_reconnect_delay: float = 30):
+        super().__init__(queue_size)
+        self.engine = engine
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.reconnects = 0
+        self._listener = None
+        self._reconnecting: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def connected(self) -> bool:
+        return self._listener is not None
+
+    async def start(self):
+        self._stopping = False
+        await self._listen()
+
+    async def _listen(self):
+        import asyncpg
+        dsn = self.engine.url.set(drivername='postgresql').render_as_string(hide_password=False)
+        listener = await asyncpg.connect(dsn)
+        await listener.add_listener(self.channel, self._on_notify)
+        listener.add_termination_listener(self._on_terminate)
+        self._listener = listener
+
+    async def stop(self):
+        self._stopping = True
+        if self._reconnecting is not None:
+            self._reconnecting.cancel()
+            self._reconnecting = None
+        if self._listener is not None:
+            listener, self._listener = self._listener, None
+            await listener.close()
+
+    async def publish(self, *events: dict):
+        """All events go out in one transaction, so they are delivered together when it commits"""
+        if not events:
+            return
+        self.published += len(events)
+        async with self.engine.begin() as connection:
+            await connection.execute(text("SELECT pg_notify(:channel, :payload)"),
+                                     [{'channel': self.channel, 'payload': orjson.dumps(event).decode()}
+                                      for event in events])
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str):
+        self.deliver(payload.encode())
+
+    def _on_terminate(self, connection):
+        if self._stopping or connection is not self._listener:
+            return
+        self._listener = None
+        logger.error(f"LISTEN connection for {self.channel} lost: subscribers of this worker get no events "
+                     f"until it is reconnected, closing {len(self.subscribers)} open subscriptions")
+        self.close_all()
+        self._reconnecting = asyncio.ensure_future(self._reconnect())
+
+    async def _reconnect(self):
+        delay = self.reconnect_delay
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await self._listen()
+            except Exception as e:
+                delay = min(delay * 2, self.max_reconnect_delay)
+                logger.warning(f"LISTEN connection for {self.channel} not restored, retrying in {delay}s. Error: {e}")
+                continue
+            self.reconnects += 1
+            self._reconnecting = None
+            logger.info(f"LISTEN connection for {self.channel} restored")
+            return
+
+    def stats(self) -> dict:
+        return {**super().stats(), 'connected': self.connected(), 'reconnects': self.reconnects}
+
+
+async def sse_stream(broker: MemoryBroker, heartbeat: float) -> AsyncIterator[bytes]:
+    """Server-sent events of broker, with a comment line every heartbeat seconds to keep proxies from
+    closing an idle stream; a dropped subscriber gets a final "dropped" event"""
+    async with broker.subscribe() as subscription:
+        while True:
+            try:
+                data = await asyncio.wait_for(subscription.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield b': keep-alive\n\n'
+                continue
+            if data is None:
+                yield b'event: dropped\ndata: {}\n\n'
+                return
+            yield b'data: ' + data + b'\n\n'
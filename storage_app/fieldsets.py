@@ -0,0 +1,18 @@
+from typing import Optional, Sequence, Tuple
+
+FIELDS_DESCRIPTION = "Comma-separated subset of response fields, e.g. id,title,category"
+
+
+class InvalidFields(ValueError):
+    """Fieldset names fields the schema doesn't have"""
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> Optional[Tuple[str, ...]]:
+    """Turn ?fields=title,id into ('id', 'title') in schema order; None when every field is wanted"""
+    if not fields or not fields.strip(' ,'):
+        return None
+    requested = {name.strip() for name in fields.split(',') if name.strip()}
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise InvalidFields(', '.join(sorted(unknown)))
+    return tuple(name for name in allowed if name in requested)
@@ -0,0 +1,56 @@
+from fastapi import APIRouter
+
+from storage_app.articles.controllers.article_cache import article_cache
+from storage_app.articles.controllers.article_events import article_events
+from storage_app.authentication.controllers.password_controller import hashing_pool
+from storage_app.db_config import engine
+from storage_app.logger_config import console_rate_limit, log_rate_limit, log_sink
+from storage_app.singleflight import flights
+from storage_app.users.controllers.db_user_controller import user_cache, user_loader
+
+router = APIRouter(
+    prefix='/internal',
+    tags=['internal'],
+    include_in_schema=False,
+)
+
+
+@router.get("/password-pool")
+async def show_password_pool():
+    return hashing_pool.stats()
+
+
+@router.get("/db-pool")
+async def show_db_pool():
+    return engine.pool.stats()
+
+
+@router.get("/logging")
+async def show_logging():
+    return {**log_sink.stats(), 'suppressed': log_rate_limit.suppressed,
+            'console_suppressed': console_rate_limit.suppressed}
+
+
+@router.get("/article-cache")
+async def show_article_cache():
+    return article_cache.stats()
+
+
+@router.get("/singleflight")
+async def show_singleflight():
+    return {flight.name: flight.stats() for flight in flights}
+
+
+@router.get("/user-cache")
+async def show_user_cache():
+    return user_cache.stats()
+
+
+@router.get("/user-loader")
+async def show_user_loader():
+    return user_loader.stats()
+
+
+@router.get("/article-events")
+async def show_article_events():
+    return article_events.stats()
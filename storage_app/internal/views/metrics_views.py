@@ -0,0 +1,84 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from storage_app.articles.controllers.article_cache import article_cache
+from storage_app.articles.controllers.article_events import article_events
+from storage_app.authentication.controllers.password_controller import hashing_pool
+from storage_app.db_config import engine, replicas
+from storage_app.metrics import REGISTRY, Collected
+from storage_app.singleflight import flights
+from storage_app.users.controllers.db_user_controller import user_cache
+
+router = APIRouter(
+    tags=['internal'],
+    include_in_schema=False,
+)
+
+
+def pools():
+    yield 'primary', engine.pool
+    for i, replica in enumerate(replicas.engines):
+        yield f'replica{i}', replica.pool
+
+
+def pool_connections():
+    for name, pool in pools():
+        stats = pool.stats()
+        for state in ('checked_in', 'checked_out', 'overflow'):
+            yield (name, state), stats[state]
+
+
+def pool_timeouts():
+    for name, pool in pools():
+        yield (name,), pool.stats()['timeouts']
+
+
+def password_pool():
+    stats = hashing_pool.stats()
+    for state in ('busy', 'queued'):
+        yield (state,), stats[state]
+
+
+def article_cache_lookups():
+    stats = article_cache.stats()
+    for result in ('hits', 'stale_hits', 'misses'):
+        yield (result,), stats[result]
+
+
+def user_cache_lookups():
+    stats = user_cache.stats()
+    for result in ('hits', 'misses'):
+        yield (result,), stats[result]
+
+
+def singleflight_calls():
+    for flight in flights:
+        yield (flight.name, 'executed'), flight.calls
+        yield (flight.name, 'coalesced'), flight.coalesced
+
+
+REGISTRY.register(Collected('db_pool_connections', 'Pool connections by state', 'gauge', ('engine', 'state'),
+                            pool_connections))
+REGISTRY.register(Collected('db_pool_timeouts_total', 'Checkouts that gave up waiting for a connection', 'counter',
+                            ('engine',), pool_timeouts))
+REGISTRY.register(Collected('password_hashing_tasks', 'bcrypt calls running or queued in the hashing pool', 'gauge',
+                            ('state',), password_pool))
+REGISTRY.register(Collected('password_hashing_rejected_total', 'bcrypt calls rejected with 503', 'counter', (),
+                            lambda: [((), hashing_pool.rejected)]))
+REGISTRY.register(Collected('article_cache_lookups_total', 'Article cache lookups by result', 'counter', ('result',),
+                            article_cache_lookups))
+REGISTRY.register(Collected('user_cache_lookups_total', 'User cache lookups by result', 'counter', ('result',),
+                            user_cache_lookups))
+REGISTRY.register(Collected('user_cache_entries', 'Users cached in this process', 'gauge', (),
+                            lambda: [((), user_cache.stats()['size'])]))
+REGISTRY.register(Collected('article_event_subscribers', 'Open article event streams in this process', 'gauge', (),
+                            lambda: [((), len(article_events.subscribers))]))
+REGISTRY.register(Collected('article_event_dropped_total', 'Subscribers dropped for falling behind', 'counter', (),
+                            lambda: [((), article_events.dropped)]))
+REGISTRY.register(Collected('singleflight_calls_total', 'Reads run for real or served from an identical one in flight',
+                            'counter', ('name', 'result'), singleflight_calls))
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def show_metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type='text/plain; version=0.0.4')
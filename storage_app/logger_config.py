@@ -1,10 +1,164 @@
+import atexit
+import os
+import queue
+import sys
+import threading
+import time
+import zipfile
+from datetime import datetime, timedelta
+
 from loguru import logger
 
-logger.add(
+from storage_app.config import SETTINGS
+
+
+class BatchingFileSink:
+    """Loguru sink that only enqueues messages; a writer thread appends them to file in batches.
+
+    The queue is bounded: when the writer falls behind, new messages are dropped and counted
+    instead of blocking the event loop. The file is rotated daily at rotation_time and zipped.
+    """
+
+    def __init__(self, path: str, queue_size: int, batch_size: int, flush_interval: float,
+                 rotation_time: str = "11:00"):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rotation_time = datetime.strptime(rotation_time, "%H:%M").time()
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._rotate_at = self._next_rotation(datetime.now())
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def write(self, message: str):
+        try:
+            self._queue.put_nowait(message)
+            self.queued += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def stats(self) -> dict:
+        return {
+            'queued': self.queued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'batches': self.batches,
+            'backlog': self._queue.qsize(),
+            'queue_size': self._queue.maxsize,
+        }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [message for message in batch if message is not None]
+            self._write_batch(batch)
+        if self._file:
+            self._file.close()
+
+    def _write_batch(self, batch):
+        if not batch:
+            return
+        if datetime.now() >= self._rotate_at:
+            self._rotate()
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf8')
+        self._file.write(''.join(batch))
+        self._file.flush()
+        self.written += len(batch)
+        self.batches += 1
+
+    def _rotate(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self.path):
+            root, ext = os.path.splitext(self.path)
+            rotated = f"{root}.{datetime.now():%Y-%m-%d_%H-%M-%S_%f}{ext}"
+            os.rename(self.path, rotated)
+            with zipfile.ZipFile(rotated + '.zip', 'w', zipfile.ZIP_DEFLATED) as archive:
+                archive.write(rotated, os.path.basename(rotated))
+            os.remove(rotated)
+        self._rotate_at = self._next_rotation(datetime.now())
+
+    def _next_rotation(self, now: datetime) -> datetime:
+        rotate_at = datetime.combine(now.date(), self.rotation_time)
+        return rotate_at if rotate_at > now else rotate_at + timedelta(days=1)
+
+
+class SiteRateLimit:
+    """Loguru filter letting through at most `rate` records per second from each logging call site.
+
+    Warnings and errors always pass. The number of records swallowed since the last one that
+    got through is attached to it as extra["suppressed"].
+    """
+
+    def __init__(self, rate: float, min_unlimited_level: int = 30):
+        self.rate = rate
+        self.min_unlimited_level = min_unlimited_level
+        self.suppressed = 0
+        self._sites = {}
+
+    def __call__(self, record) -> bool:
+        if record["level"].no >= self.min_unlimited_level:
+            return True
+        site = (record["name"], record["line"])
+        now = time.monotonic()
+        tokens, updated, suppressed = self._sites.get(site, (self.rate, now, 0))
+        tokens = min(self.rate, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._sites[site] = (tokens, now, suppressed + 1)
+            self.suppressed += 1
+            return False
+        if suppressed:
+            record["extra"]["suppressed"] = suppressed
+        self._sites[site] = (tokens - 1, now, 0)
+        return True
+
+
+log_sink = BatchingFileSink(
     "logging_records/debug.json",
+    queue_size=SETTINGS.LOG_QUEUE_SIZE,
+    batch_size=SETTINGS.LOG_BATCH_SIZE,
+    flush_interval=SETTINGS.LOG_FLUSH_SECONDS,
+)
+log_rate_limit = SiteRateLimit(rate=SETTINGS.LOG_RATE_PER_SITE)
+# Limiters count the records they pass: each handler has its own, so one doesn't spend the other's budget
+console_rate_limit = SiteRateLimit(rate=SETTINGS.LOG_RATE_PER_SITE)
+
+# loguru's default handler writes every DEBUG record to stderr synchronously and unfiltered; console
+# output is limited to LOG_STDERR_LEVEL, rate limited too and written by loguru's own writer thread
+logger.remove()
+logger.add(
+    sys.stderr,
+    level=SETTINGS.LOG_STDERR_LEVEL,
+    filter=console_rate_limit,
+    enqueue=True,
+)
+logger.add(
+    log_sink,
     format="{time}{level}{message}",
     level="INFO",
-    rotation="11:00",
-    compression="zip",
+    filter=log_rate_limit,
     serialize=True
 )
+atexit.register(log_sink.stop)
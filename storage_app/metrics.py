@@ -0,0 +1,168 @@
+import bisect
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import event
+
+from storage_app.profiler import current_profile
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+SQL_OPERATIONS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE'}
+
+Sample = Tuple[str, Sequence[str], Sequence[str], float]
+
+
+def format_sample(name: str, labelnames: Sequence[str], labels: Sequence[str], value: float) -> str:
+    if not labelnames:
+        return f'{name} {float(value)!r}'
+    pairs = ','.join('{}="{}"'.format(key, str(label).replace('\\', '\\\\').replace('"', '\\"'))
+                     for key, label in zip(labelnames, labels))
+    return f'{name}{{{pairs}}} {float(value)!r}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[tuple, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, value in self.values.items():
+            yield self.name, self.labelnames, labels, value
+
+
+class Histogram:
+    """Keeps per-bucket counts and a sum for each label set; buckets are made cumulative only when scraped"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self.series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def samples(self) -> Iterable[Sample]:
+        bucket_labelnames = self.labelnames + ('le',)
+        for labels, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                yield f'{self.name}_bucket', bucket_labelnames, labels + (le,), cumulative
+            yield f'{self.name}_sum', self.labelnames, labels, total
+            yield f'{self.name}_count', self.labelnames, labels, cumulative
+
+
+class Collected:
+    """Metric read at scrape time from stats the component keeps anyway, e.g. pool gauges"""
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Sequence[str],
+                 collect: Callable[[], Iterable[Tuple[tuple, float]]]):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, value in self.collect():
+            yield self.name, self.labelnames, labels, value
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(format_sample(*sample) for sample in metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+http_requests = REGISTRY.register(Counter(
+    'http_requests_total', 'HTTP responses by method, route template and status', ('method', 'route', 'status')))
+http_latency = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'Time to the end of the response body', ('method', 'route')))
+db_queries = REGISTRY.register(Histogram(
+    'db_query_duration_seconds', 'SQL statements by engine and operation', ('engine', 'operation'), QUERY_BUCKETS))
+token_refreshes = REGISTRY.register(Counter(
+    'token_refreshes_total', 'Expired access tokens renewed from the refresh token', ('result',)))
+
+
+class MetricsMiddleware:
+    """ASGI middleware observing latency and status per route.
+
+    Routes are labelled by path template (the router leaves the matched route in scope), so label
+    cardinality stays bounded; requests matching no route share the "unmatched" label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get('route')
+            path = getattr(route, 'path_format', 'unmatched')
+            http_latency.observe(time.perf_counter() - started, scope['method'], path)
+            http_requests.inc(scope['method'], path, str(status))
+
+
+def instrument_engine(engine, name: str):
+    """Time every statement executed through engine (async or sync) into db_queries and the current profile"""
+    sync_engine = getattr(engine, 'sync_engine', engine)
+
+    @event.listens_for(sync_engine, 'before_cursor_execute')
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        context.query_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, 'after_cursor_execute')
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context.query_started
+        operation = statement.lstrip()[:6].upper()
+        db_queries.observe(elapsed, name, operation if operation in SQL_OPERATIONS else 'OTHER')
+        profile = current_profile.get()
+        if profile is not None:
+            profile.record(statement, elapsed)
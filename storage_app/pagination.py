@@ -0,0 +1,38 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    """Cursor can't be decoded into a (created_at, id) pair"""
+
+
+def encode_cursor(created_at: datetime, item_id: int) -> str:
+    """Pack keyset position into an opaque url-safe string"""
+    raw = json.dumps([created_at.isoformat(), item_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Unpack cursor produced by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, item_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(item_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+
+
+def build_page(items: Sequence, limit: int) -> dict:
+    """Cut the extra look-ahead row off and point next_cursor at the last returned item"""
+    next_cursor: Optional[str] = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return {'items': items, 'next_cursor': next_cursor}
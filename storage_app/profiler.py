@@ -0,0 +1,73 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from storage_app.config import SETTINGS
+from storage_app.logger_config import logger
+
+current_profile: ContextVar[Optional['QueryProfile']] = ContextVar('current_profile', default=None)
+
+
+class QueryProfile:
+    """Queries executed while this profile is current, filled in by the engine hooks of instrument_engine"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.duration += elapsed
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int = 2) -> Dict[str, int]:
+        """Identical SQL run several times in one request, usually a lookup done per item (N+1)"""
+        return {statement: n for statement, n in self.statements.items() if n >= threshold}
+
+    def server_timing(self, total: float) -> str:
+        return f'db;dur={self.duration * 1000:.2f};desc="{self.count} queries", app;dur={total * 1000:.2f}'
+
+
+@contextmanager
+def profile_queries():
+    """Collect queries run inside the block, e.g. to assert a query budget in tests"""
+    profile = QueryProfile()
+    token = current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        current_profile.reset(token)
+
+
+class ProfilerMiddleware:
+    """With SQL_PROFILER on, adds Server-Timing with query count and DB time to every response and logs
+    a per-request summary, as a warning when some statement repeated SQL_PROFILER_REPEAT_THRESHOLD times.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not SETTINGS.SQL_PROFILER:
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                timing = profile.server_timing(time.perf_counter() - started)
+                message['headers'] = [*message.get('headers', []), (b'server-timing', timing.encode())]
+            await send(message)
+
+        with profile_queries() as profile:
+            await self.app(scope, receive, send_with_timing)
+        repeated = profile.repeated(SETTINGS.SQL_PROFILER_REPEAT_THRESHOLD)
+        log = logger.bind(method=scope['method'], route=getattr(scope.get('route'), 'path_format', 'unmatched'),
+                          queries=profile.count, db_ms=round(profile.duration * 1000, 2),
+                          total_ms=round((time.perf_counter() - started) * 1000, 2), repeated=repeated)
+        if repeated:
+            log.warning(f"Repeated statements in {scope['method']} {scope['path']}")
+        else:
+            log.info(f"{profile.count} queries in {scope['method']} {scope['path']}")
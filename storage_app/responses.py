@@ -0,0 +1,35 @@
+from typing import Iterable, Sequence
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+
+from storage_app.articles.models.api_article_models import ArticleOut
+from storage_app.users.models.api_users import UserOut
+
+ARTICLE_FIELDS = tuple(ArticleOut.__fields__)
+USER_FIELDS = tuple(UserOut.__fields__)
+
+
+def row_payload(row, fields: Sequence[str] = ARTICLE_FIELDS) -> dict:
+    """Response fields read straight off a trusted DB row (or cached record), skipping pydantic validation"""
+    return {field: getattr(row, field) for field in fields}
+
+
+def dump_articles(articles: Iterable) -> bytes:
+    """Newline-delimited JSON, one article per line"""
+    return b''.join(orjson.dumps(row_payload(article)) + b'\n' for article in articles)
+
+
+def orjson_response(content, response: Response) -> ORJSONResponse:
+    """Encode content with orjson, keeping headers that the view and dependencies put on response"""
+    result = ORJSONResponse(content)
+    result.raw_headers.extend(response.raw_headers)
+    return result
+
+
+def page_response(page: dict, response: Response, fields: Sequence[str] = ARTICLE_FIELDS) -> ORJSONResponse:
+    return orjson_response({
+        'items': [row_payload(article, fields) for article in page['items']],
+        'next_cursor': page['next_cursor'],
+    }, response)
@@ -0,0 +1,56 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, List, TypeVar
+
+T = TypeVar('T')
+
+flights: List['SingleFlight'] = []
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share the first caller's in-flight call and its result.
+
+    The first caller runs func itself (with its own DB session); the others wait on a shielded future,
+    so a waiter being cancelled never affects the rest. If the running caller is cancelled, waiters
+    don't inherit its cancellation: they retry and one of them runs func instead. Results are handed to
+    every waiter as is, so func has to return something safe to share: a detached or pydantic copy.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.coalesced = 0
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        flights.append(self)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        while key in self._in_flight:
+            future = self._in_flight[key]
+            try:
+                result = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                continue
+            self.coalesced += 1
+            return result
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting: mark the exception as retrieved so asyncio doesn't report it
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._in_flight[key] = future
+        self.calls += 1
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._in_flight[key]
+
+    def stats(self) -> dict:
+        return {'calls': self.calls, 'coalesced': self.coalesced, 'in_flight': len(self._in_flight)}
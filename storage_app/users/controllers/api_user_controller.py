@@ -1,22 +1,33 @@
+from typing import Optional, Sequence
+
 from fastapi import HTTPException, status
+from sqlalchemy import exc
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from storage_app.articles.controllers.api_article_controller import parse_cursor
+from storage_app.articles.controllers.article_cache import article_cache, invalidate_articles, user_articles_key
 from storage_app.articles.controllers.db_article_controller import DBArticleController
+from storage_app.authentication.controllers.password_controller import HashingPoolSaturated
+from storage_app.db_config import primary_or_none
 from storage_app.users.controllers.db_user_controller import DBUserController
 from storage_app.logger_config import logger
+from storage_app.articles.models.api_article_models import ArticleRecordPage
+from storage_app.pagination import build_page
+from storage_app.responses import USER_FIELDS
 from storage_app.users.models.api_users import UserCreate, UserPatch
 
 
 class APIUserController:
     @staticmethod
     async def create_user(user: UserCreate, db: AsyncSession):
-        if await DBUserController.get_user_by_username(username=user.username, db=db):
-            logger.error(f"User with username {user.username} already exists")
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Username {user.username} already exists")
         try:
             new_user = await DBUserController.create_user(user=user, db=db)
+        except HashingPoolSaturated:
+            raise
         except Exception:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Repeat request later")
+        if not new_user:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Username {user.username} already exists")
         return new_user
 
     @staticmethod
@@ -28,39 +39,47 @@ class APIUserController:
         return user
 
     @staticmethod
-    async def get_user_articles(user_id: int, db: AsyncSession):
+    async def get_user_articles(user_id: int, db: AsyncSession, limit: int, cursor: Optional[str] = None):
         user = await DBUserController.get_user_by_id(user_id=user_id, db=db)
         if not user:
             logger.error(f"Attempt to get nonexistent user with id {user_id}")
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User not found")
-        user_articles = await DBArticleController.get_user_articles(user_id=user_id, db=db)
-        return user_articles
+        decoded_cursor = parse_cursor(cursor)
+
+        async def load_page(session: AsyncSession) -> ArticleRecordPage:
+            user_articles = await DBArticleController.get_user_articles(user_id=user_id, db=session, limit=limit,
+                                                                        cursor=decoded_cursor)
+            return ArticleRecordPage.parse_obj(build_page(user_articles, limit=limit))
+
+        page = await article_cache.get_or_load(await user_articles_key(user_id, limit, cursor), load_page,
+                                               primary_or_none(db))
+        return {'items': page.items, 'next_cursor': page.next_cursor}
 
     @staticmethod
-    async def get_users(db: AsyncSession):
-        return await DBUserController.get_users(db=db)
+    async def get_users(db: AsyncSession, fields: Sequence[str] = USER_FIELDS):
+        return await DBUserController.get_users(db=db, fields=fields)
 
     @staticmethod
     async def delete_user(user_id: int, db: AsyncSession):
-        if not await DBUserController.get_user_by_id(user_id=user_id, db=db):
-            logger.error(f"Attempt to get nonexistent user with id {user_id}")
+        article_ids = await DBArticleController.get_user_article_ids(user_id=user_id, db=db)
+        if not await DBUserController.delete_user(user_id=user_id, db=db):
+            logger.error(f"Attempt to delete nonexistent user with id {user_id}")
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User {user_id} not found")
-        await DBUserController.delete_user(user_id=user_id, db=db)
+        await invalidate_articles(user_id, *article_ids)
         return {'deleted'}
 
     @staticmethod
     async def update_user(user: UserPatch, user_id: int, db: AsyncSession):
-        user_db = await DBUserController.get_user_by_id(user_id=user_id, db=db)
-        if not user_db:
-            logger.error(f"Attempt to update nonexistent user with id {user_id}")
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User {user_id} not found")
-        if user.username:
-            if await DBUserController.get_user_by_username(username=user.username, db=db):
-                logger.error(f"User with username {user.username} already exists")
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Username {user.username} already exists")
         try:
             updated_user = await DBUserController.update_user(user=user, user_id=user_id, db=db)
+        except HashingPoolSaturated:
+            raise
+        except exc.IntegrityError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Username {user.username} already exists")
         except Exception:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Repeat request later")
+        if not updated_user:
+            logger.error(f"Attempt to update nonexistent user with id {user_id}")
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User {user_id} not found")
         return updated_user
 
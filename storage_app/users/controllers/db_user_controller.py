@@ -1,24 +1,85 @@
+from typing import Any, List, Sequence, Tuple
+
 from pydantic import EmailStr
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from storage_app.articles.models.db_article_models import Article, ArticleTombstone
 from storage_app.authentication.controllers.password_controller import PasswordController
+from storage_app.authentication.controllers.revocation_controller import RevocationController
+from storage_app.cache import TTLCache
+from storage_app.config import SETTINGS
+from storage_app.dataloader import BatchLoader
+from storage_app.db_config import SessionLocal, utcnow
 from storage_app.users.models.api_users import UserCreate, UserPatch
 from storage_app.users.models.db_users import User
-from sqlalchemy import exc, select, delete, update
+from sqlalchemy import exc, select, insert, delete, update, or_, lambda_stmt
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from storage_app.logger_config import logger
+from storage_app.singleflight import SingleFlight
+
+
+# Lookups by username/id happen on every authenticated request; entries are detached copies
+# keyed both ways and dropped on update/delete (other workers see changes after the TTL).
+# Entries leave out the password hash: logins always check it against the database
+user_cache = TTLCache(maxsize=SETTINGS.USER_CACHE_SIZE, ttl=SETTINGS.USER_CACHE_TTL_SECONDS)
+
+
+# Concurrent cache misses (e.g. a token refresh storm) share one query; they get the detached cached copy
+user_lookups = SingleFlight('user-lookups')
+
+
+def cache_user(user: User) -> User:
+    cached = User(id=user.id, username=user.username)
+    user_cache.set(('username', user.username.lower()), cached)
+    user_cache.set(('id', user.id), cached)
+    return cached
+
+
+async def load_users(keys: List[Tuple[str, Any]], db: AsyncSession) -> dict:
+    """Resolve ('id', id) and ('username', lowercase username) keys with one IN query.
+
+    Both lists are expanding parameters of one cached statement, so any mix of keys (an empty list
+    matches nothing) reuses the same compiled SQL.
+    """
+    ids = [value for kind, value in keys if kind == 'id']
+    usernames = [value for kind, value in keys if kind == 'username']
+    query = lambda_stmt(lambda: select(User).where(or_(User.id.in_(ids), User.username.in_(usernames))))
+    result = await db.execute(query)
+    found = {}
+    for user in result.scalars():
+        cached = cache_user(user)
+        found[('id', cached.id)] = found[('username', cached.username.lower())] = cached
+    return found
+
+
+# Lookups missing the cache within one event loop tick, from any request, go out as a single query
+user_loader = BatchLoader(load_users, session_factory=SessionLocal)
 
 
 class DBUserController:
     @staticmethod
     async def create_user(user: UserCreate, db: AsyncSession):
-        """Creation of user instance in DB"""
+        """Creation of user instance in DB in one statement; None if username is taken"""
         try:
-            hashed_password = PasswordController.generate_hashed_password(user.password)
-            new_user = User(username=user.username, password=hashed_password)
-            db.add(new_user)
-            await db.commit()
-            await db.refresh(new_user)
+            hashed_password = await PasswordController.generate_hashed_password(user.password)
+            # ON CONFLICT DO NOTHING is PostgreSQL syntax: other databases catch the IntegrityError instead
+            if db.bind.dialect.name == 'postgresql':
+                query = pg_insert(User).values(username=user.username, password=hashed_password) \
+                    .on_conflict_do_nothing(index_elements=[User.username]).returning(User.id, User.username)
+                new_user = (await db.execute(query)).one_or_none()
+                await db.commit()
+            else:
+                new_user = User(username=user.username, password=hashed_password)
+                db.add(new_user)
+                try:
+                    await db.commit()
+                except exc.IntegrityError:
+                    await db.rollback()
+                    new_user = None
+            if new_user is None:
+                logger.error(f"User with username {user.username} already exists")
+                return None
             logger.info(f"User {new_user.username} registered")
             return new_user
         except exc.SQLAlchemyError as e:
@@ -27,32 +88,53 @@ class DBUserController:
 
     @staticmethod
     async def get_user_by_username(username: EmailStr, db: AsyncSession):
-        """Show user by username"""
-        query = select(User).where(User.username == username)
+        """Show user by username; misses are batched by user_loader, on db when no other lookup joins the batch"""
+        key = ('username', username.lower())
+        cached = user_cache.get(key)
+        if cached is not None:
+            return cached
+        return await user_lookups.do(key, lambda: user_loader.load(key, db))
+
+    @staticmethod
+    async def get_user_credentials(username: EmailStr, db: AsyncSession):
+        """User with the password hash, always from DB: a cached or replicated copy may predate a password change"""
+        username = username.lower()
+        query = lambda_stmt(lambda: select(User).where(User.username == username))
         result = await db.execute(query)
         return result.scalar_one_or_none()
 
     @staticmethod
     async def get_user_by_id(user_id: int, db: AsyncSession):
-        """Show user by id"""
-        query = select(User).where(User.id == user_id)
-        result = await db.execute(query)
-        return result.scalar_one_or_none()
+        """Show user by id; misses are batched by user_loader, on db when no other lookup joins the batch"""
+        key = ('id', user_id)
+        cached = user_cache.get(key)
+        if cached is not None:
+            return cached
+        return await user_lookups.do(key, lambda: user_loader.load(key, db))
 
     @staticmethod
-    async def get_users(db: AsyncSession):
-        """Show all users"""
-        result = await db.execute(select(User))
-        return result.scalars().all()
+    async def get_users(db: AsyncSession, fields: Sequence[str] = ('id', 'username')):
+        """Show all users as plain rows of the fields' columns"""
+        result = await db.execute(select(*(User.__table__.columns[name] for name in fields)))
+        return result.all()
 
     @staticmethod
-    async def delete_user(user_id: int, db: AsyncSession):
-        """Delete user by id"""
-        query = delete(User).where(User.id == user_id)
-        await db.execute(query)
+    async def delete_user(user_id: int, db: AsyncSession) -> bool:
+        """Delete user by id, leaving tombstones of the articles the cascade removes; False if there was no such user"""
+        await db.execute(insert(ArticleTombstone).from_select(
+            ['article_id', 'user_id', 'deleted_at'],
+            select(Article.id, Article.user_id, utcnow()).where(Article.user_id == user_id)))
+        query = lambda_stmt(lambda: delete(User).where(User.id == user_id))
+        result = await db.execute(query)
+        if not result.rowcount:
+            await db.rollback()
+            return False
+        revocation = await RevocationController.revoke_user_tokens(user_id=user_id, db=db)
         await db.commit()
+        RevocationController.apply(revocation)
+        user_cache.evict(lambda cached: cached.id == user_id)
         logger.info(f"User with {user_id} deleted")
-        return {'deleted'}
+        return True
 
     @staticmethod
     async def update_user(user: UserPatch, user_id: int, db: AsyncSession):
@@ -60,13 +142,28 @@ class DBUserController:
         try:
             update_data = user.dict(exclude_unset=True)
             if update_data.get('password'):
-                update_data['password'] = PasswordController.generate_hashed_password(user.password)
-            updated_user = update(User).where(User.id == user_id).values(**update_data)
-            await db.execute(updated_user)
+                update_data['password'] = await PasswordController.generate_hashed_password(user.password)
+            query = update(User).where(User.id == user_id).values(**update_data)
+            if db.bind.dialect.full_returning:
+                updated_user = (await db.execute(query.returning(User.id, User.username))).one_or_none()
+            else:
+                result = await db.execute(query)
+                updated_user = (await db.execute(select(User).where(User.id == user_id))).scalar_one_or_none() \
+                    if result.rowcount else None
+            revocation = None
+            if updated_user and update_data.get('password'):
+                revocation = await RevocationController.revoke_user_tokens(user_id=user_id, db=db)
             await db.commit()
-            logger.info(f"User {user_id} updated")
-            result = await db.execute(select(User).where(User.id == user_id))  # !!!!!!!!!!!!!!!!
-            return result.scalar_one_or_none()
+            if revocation:
+                RevocationController.apply(revocation)
+            user_cache.evict(lambda cached: cached.id == user_id)
+            if updated_user:
+                logger.info(f"User {user_id} updated")
+            return updated_user
+        except exc.IntegrityError:
+            await db.rollback()
+            logger.error(f"User {user_id} not updated: username {user.username} already exists")
+            raise
         except exc.SQLAlchemyError as e:
             logger.error(f"User not updated. Error: {e._message()}")
             raise Exception
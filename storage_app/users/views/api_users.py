@@ -1,11 +1,16 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from storage_app.articles.models.api_article_models import ArticleOut
+from storage_app.articles.models.api_article_models import ArticlePage
 from storage_app.authentication.views.authentication_views import get_current_user
-from storage_app.db_config import get_db
+from storage_app.conditional import is_not_modified, make_etag, not_modified, set_validators
+from storage_app.articles.controllers.api_article_controller import requested_fields
+from storage_app.db_config import get_db, get_read_db
+from storage_app.fieldsets import FIELDS_DESCRIPTION
+from storage_app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from storage_app.responses import ARTICLE_FIELDS, USER_FIELDS, orjson_response, page_response, row_payload
 from storage_app.users.controllers.api_user_controller import APIUserController
 from storage_app.users.models.api_users import UserOut, UserCreate, UserPatch
 
@@ -21,18 +26,40 @@ async def create_new_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/{user_id}", response_model=UserOut)
-async def show_user(user_id: int, db: AsyncSession = Depends(get_db)):
-    return await APIUserController.get_user(user_id=user_id, db=db)
+async def show_user(user_id: int, response: Response,
+                    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+                    db: AsyncSession = Depends(get_read_db)):
+    selected = requested_fields(fields, USER_FIELDS)
+    user = await APIUserController.get_user(user_id=user_id, db=db)
+    if selected:
+        return orjson_response(row_payload(user, selected), response)
+    return user
 
 
-@router.get("/{user_id}/articles", response_model=List[ArticleOut])
-async def show_user_articles(user_id: int, db: AsyncSession = Depends(get_db)):
-    return await APIUserController.get_user_articles(user_id=user_id, db=db)
+@router.get("/{user_id}/articles", response_model=ArticlePage)
+async def show_user_articles(user_id: int, request: Request, response: Response,
+                             limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                             cursor: Optional[str] = None,
+                             fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+                             db: AsyncSession = Depends(get_read_db)):
+    selected = requested_fields(fields)
+    # Pages come whole from the article cache, so here the fieldset only trims the payload
+    page = await APIUserController.get_user_articles(user_id=user_id, db=db, limit=limit, cursor=cursor)
+    etag = make_etag(page['items'], page['next_cursor'], *(selected or ()))
+    if is_not_modified(request, etag):
+        return not_modified(response, etag)
+    set_validators(response, etag)
+    return page_response(page, response, selected or ARTICLE_FIELDS)
 
 
 @router.get("/", response_model=List[UserOut])
-async def show_users(db: AsyncSession = Depends(get_db)):
-    return await APIUserController.get_users(db=db)
+async def show_users(response: Response, fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+                     db: AsyncSession = Depends(get_read_db)):
+    selected = requested_fields(fields, USER_FIELDS)
+    users = await APIUserController.get_users(db=db, fields=selected or USER_FIELDS)
+    if selected:
+        return orjson_response([row_payload(user, selected) for user in users], response)
+    return users
 
 
 @router.patch("/{user_id}", status_code=202, response_model=UserOut)
@@ -5,17 +5,32 @@ import pytest
 import pytest_asyncio
 from fastapi import FastAPI
 from httpx import AsyncClient
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncConnection
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from main import app
-from storage_app.db_config import Base, get_db
+from storage_app.articles.controllers.article_cache import article_cache
+from storage_app.authentication.controllers.revocation_controller import revocation_list
+from storage_app.db_config import Base, get_db, get_read_db
+from storage_app.metrics import instrument_engine
+from storage_app.users.controllers.db_user_controller import user_cache, user_loader
 
 SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite://"
 
 async_engine = create_async_engine(SQLALCHEMY_DATABASE_URL, poolclass=StaticPool, echo=True)
 
+instrument_engine(async_engine, 'primary')
+
+
+@event.listens_for(async_engine.sync_engine, 'connect')
+def enforce_foreign_keys(dbapi_connection, connection_record):
+    """SQLite leaves foreign keys (and so ON DELETE CASCADE) off unless asked, unlike PostgreSQL"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
 async_session = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
 
 
@@ -37,6 +52,11 @@ async def engine():
     async with async_engine.begin() as connection:
         await connection.run_sync(Base.metadata.drop_all)
         await connection.run_sync(Base.metadata.create_all)
+    user_cache.clear()
+    revocation_list.clear()
+    await article_cache.backend.clear()
+    article_cache.session_factory = async_session
+    user_loader.session_factory = async_session
 
 
 @pytest_asyncio.fixture()
@@ -58,6 +78,7 @@ async def override_get_db(db_session: AsyncSession) -> Callable:
 @pytest_asyncio.fixture()
 async def _app(override_get_db: Callable) -> FastAPI:
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
     return app
 
 
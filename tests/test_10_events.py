@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from storage_app.articles.controllers.article_events import article_events
+from storage_app.events import MemoryBroker, PostgresBroker, sse_stream
+from tests.test_2_article_api import create_articles, login
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_slow_subscriber_dropped_without_blocking_others():
+    broker = MemoryBroker(queue_size=2)
+    async with broker.subscribe() as fast, broker.subscribe() as slow:
+        for i in range(3):
+            await broker.publish({'id': i})
+            assert json.loads(await fast.get()) == {'id': i}
+        assert [await slow.get(), await slow.get(), await slow.get()] == [b'{"id":0}', b'{"id":1}', None]
+        assert broker.stats() == {'subscribers': 1, 'published': 3, 'dropped': 1}
+    assert not broker.subscribers
+
+
+async def test_sse_stream():
+    broker = MemoryBroker(queue_size=1)
+    stream = sse_stream(broker, heartbeat=0.01)
+    assert await stream.__anext__() == b': keep-alive\n\n'
+    await broker.publish({'id': 1})
+    assert await stream.__anext__() == b'data: {"id":1}\n\n'
+    await broker.publish({'id': 2}, {'id': 3})
+    assert await stream.__anext__() == b'data: {"id":2}\n\n'
+    assert await stream.__anext__() == b'event: dropped\ndata: {}\n\n'
+    with pytest.raises(StopAsyncIteration):
+        await stream.__anext__()
+    assert not broker.subscribers
+
+
+async def test_lost_listener_closes_subscriptions_and_reconnects(monkeypatch):
+    broker, attempts = PostgresBroker(engine=None, channel='test', queue_size=2, reconnect_delay=0.01), []
+    lost = object()
+
+    async def listen():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError('connection refused')
+        broker._listener = object()
+
+    monkeypatch.setattr(broker, '_listen', listen)
+    broker._listener = lost
+    async with broker.subscribe() as subscription:
+        broker._on_terminate(lost)
+        assert await asyncio.wait_for(subscription.get(), 1) is None
+    async with broker.subscribe() as subscription:
+        assert await subscription.get() is None
+    while not broker.connected():
+        await asyncio.sleep(0.01)
+    assert len(attempts) == 2 and broker.stats()['reconnects'] == 1
+    async with broker.subscribe() as subscription:
+        broker.deliver(b'{"id":1}')
+        assert await subscription.get() == b'{"id":1}'
+
+
+async def test_article_writes_publish_events(async_client: AsyncClient, db_session: AsyncSession):
+    await login(async_client)
+    async with article_events.subscribe() as subscription:
+        await create_articles(async_client, 1)
+        await async_client.patch("/articles/1", json={'title': 'renamed'})
+        await async_client.delete("/articles/1")
+        events = [json.loads(await subscription.get()) for _ in range(3)]
+    assert [(event['change'], event['id'], event['user_id']) for event in events] == [
+        ('created', 1, 1), ('updated', 1, 1), ('deleted', 1, 1)]
+    assert events[1]['article']['title'] == 'renamed' and events[2]['article'] is None
@@ -17,3 +17,34 @@ async def test_get_users(async_client: AsyncClient, db_session: AsyncSession):
     response = await async_client.get("/users/")
     print(response.json())
     assert response.status_code == 200
+
+
+async def test_create_user_duplicate(async_client: AsyncClient, db_session: AsyncSession):
+    await async_client.post("/users/", json={'username': 'dasha@mail.ru', 'password': '12345'})
+    response = await async_client.post("/users/", json={'username': 'dasha@mail.ru', 'password': '12345'})
+    assert response.status_code == 400
+
+
+async def test_update_user(async_client: AsyncClient, db_session: AsyncSession):
+    await async_client.post("/users/", json={'username': 'dasha@mail.ru', 'password': '12345'})
+    await async_client.post("/users/", json={'username': 'dasha2@mail.ru', 'password': '12345'})
+    await async_client.post("/auth/login", data={'username': 'dasha@mail.ru', 'password': '12345'})
+    response = await async_client.patch("/users/1", json={'username': 'dasha2@mail.ru'})
+    assert response.status_code == 400
+    response = await async_client.patch("/users/3", json={'username': 'dasha3@mail.ru'})
+    assert response.status_code == 404
+    response = await async_client.patch("/users/1", json={'username': 'dasha3@mail.ru'})
+    assert response.status_code == 202 and response.json()['username'] == 'dasha3@mail.ru'
+
+
+async def test_delete_user(async_client: AsyncClient, db_session: AsyncSession):
+    await async_client.post("/users/", json={'username': 'dasha@mail.ru', 'password': '12345'})
+    assert (await async_client.delete("/users/1")).status_code == 204
+    assert (await async_client.delete("/users/1")).status_code == 404
+
+
+async def test_users_sparse_fields(async_client: AsyncClient, db_session: AsyncSession):
+    await async_client.post("/users/", json={'username': 'dasha@mail.ru', 'password': '12345'})
+    assert (await async_client.get("/users/", params={'fields': 'username'})).json() == [{'username': 'dasha@mail.ru'}]
+    assert (await async_client.get("/users/1", params={'fields': 'id'})).json() == {'id': 1}
+    assert (await async_client.get("/users/1", params={'fields': 'password'})).status_code == 400
@@ -0,0 +1,263 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from storage_app.config import SETTINGS
+from storage_app.db_config import utcnow
+
+pytestmark = pytest.mark.asyncio
+
+
+async def login(async_client: AsyncClient, username: str = 'dasha@mail.ru'):
+    await async_client.post("/users/", json={'username': username, 'password': '12345'})
+    await async_client.post("/auth/login", data={'username': username, 'password': '12345'})
+
+
+async def create_articles(async_client: AsyncClient, count: int, **fields):
+    for i in range(count):
+        article = {'title': f'article {i}', 'category': 2, 'language': 1, **fields}
+        response = await async_client.post("/articles/", json=article)
+        assert response.status_code == 201
+
+
+async def test_articles_pagination(async_client: AsyncClient, db_session: AsyncSession):
+    await login(async_client)
+    await create_articles(async_client, 5)
+    titles, cursor = [], None
+    while True:
+        params = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+        response = await async_client.get("/articles/", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page['items']) <= 2
+        titles += [article['title'] for article in page['items']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert titles == [f'article {i}' for i in range(5)]
+
+
+async def test_articles_invalid_cursor(async_client: AsyncClient, db_session: AsyncSession):
+    await login(async_client)
+    response = await async_client.get("/articles/", params={'cursor': 'not-a-cursor'})
+    assert response.status_code == 400
+
+
+async def test_user_articles_pagination(async_client: AsyncClient, db_session: AsyncSession):
+    await login(async_client)
+    await create_articles(async_client, 3)
+    response = await async_client.get("/users/1/articles", params={'limit': 2})
+    page = response.json()
+    assert len(page['items']) == 2
+    response = await async_client.get("/users/1/articles", params={'limit': 2, 'cursor': page['next_cursor']})
+    page = response.json()
+    assert [article['title'] for article in page['items']] == ['article 2']
+    assert page['next_cursor'] is None
+
+
+async def test_export_articles(async_client: AsyncClient, db_session: AsyncSession):
+    await login(async_client)
+    await create_articles(async_client, 3)
+    response = await async_client.get("/articles/export")
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    lines = response.text.splitlines()
+    assert [json.loads(line)['title'] for line in lines] == ['article 0', 'article 1', 'article 2']
+
+
+async def test_articles_filters(async_client: AsyncClient, db_session: AsyncSession):
+    await login(async_client)
+    await create_articles(async_client, 2)
+    await create_articles(async_client, 1, category=3, language=2)
+    response = await async_client.get("/articles/", params={'category': 3})
+    assert [article['title'] for article in response.json()['items']] == ['article 0']
+    response = await async_client.get("/articles/", params={'language': 1, 'user_id': 1})
+    assert len(response.json()['items']) == 2
+    response = await async_client.get("/articles/", params={'created_after': '2100-01-01T00:00:00'})
+    assert response.json()['items'] == []
+    soon = datetime.now(timezone(timedelta(hours=-5))) + timedelta(minutes=1)
+    response = await async_client.get("/articles/", params={'created_before': soon.isoformat()})
+    assert len(response.json()['items']) == 3
+    response = await async_client.get("/articles/", params={'category': 42})
+    assert response.status_code == 422
+
+
+async def test_search_articles(async_client: AsyncClient, db_session: AsyncSession):
+    await login(async_client)
+    await create_articles(async_client, 1, title='Asyncio in depth', brief_description='event loop internals')
+    await create_articles(async_client, 1, title='Docker basics', brief_description='containers and asyncio')
+    await create_articles(async_client, 1, title='Pytest fixtures')
+    response = await async_client.get("/articles/search", params={'q': 'asyncio'})
+    assert response.status_code == 200
+    assert {article['title'] for article in response.json()} == {'Asyncio in depth', 'Docker basics'}
+    response = await async_client.get("/articles/search", params={'q': 'loop "internals'})
+    assert [article['title'] for article in response.json()] == ['Asyncio in depth']
+
+
+async def test_update_and_delete_article_permissions(async_client: AsyncClient, db_session: AsyncSession):
+    await login(async_client)
+    await create_articles(async_client, 1)
+    response = await async_client.patch("/articles/1", json={'title': 'renamed'})
+    assert response.status_code == 202 and response.json()['title'] == 'renamed'
+    assert (await async_client.patch("/articles/2", json={'title': 'renamed'})).status_code == 404
+    await login(async_client, username='other@mail.ru')
+    assert (await async_client.patch("/articles/1", json={'title': 'stolen'})).status_code == 403
+    assert (await async_client.delete("/articles/1")).status_code == 403
+    await login(async_client)
+    assert (await async_client.delete("/articles/1")).status_code == 204
+    assert (await async_client.delete("/articles/1")).status_code == 404
+
+
+async def test_create_articles_batch(async_client: AsyncClient, db_session: AsyncSession):
+    await login(async_client)
+    articles = [
+        {'title': 'first', 'category': 2, 'language': 1},
+        {'title': '', 'category': 2, 'language': 1},
+        {'title': 'second', 'category': 9, 'language': 1},
+        {'title': 'third', 'category': 1, 'language': 2, 'url': 'https://example.com'},
+    ]
+    response = await async_client.post("/articles/batch", json=articles)
+    assert response.status_code == 201
+    result = response.json()
+    assert [article['title'] for article in result['created']] == ['first', 'third']
+    assert [error['index'] for error in result['errors']] == [1, 2]
+    assert len((await async_client.get("/articles/")).json()['items']) == 2
+    assert (await async_client.post("/articles/batch", json=[])).status_code == 422
+    response = await async_client.post("/articles/batch", json=[{'title': ''}, {'title': 'fourth'}])
+    assert response.status_code == 422
+    assert [error['index'] for error in response.json()['detail']] == [0, 1]
+    assert len((await async_client.get("/articles/")).json()['items']) == 2
+
+
+async def test_import_articles(async_client: AsyncClient, db_session: AsyncSession, monkeypatch):
+    monkeypatch.setattr(SETTINGS, 'ADMIN_USERNAMES', ['dasha@mail.ru'])
+    await login(async_client)
+    ndjson = '{"title": "first", "category": 2, "language": 1}\n{"title": ""}\nnot json\n' \
+             '{"title": "second", "category": 3, "language": 2, "url": "https://example.com"}\n'
+    response = await async_client.post("/articles/import", content=ndjson.encode())
+    assert response.status_code == 201
+    assert response.json()['imported'] == 2
+    assert [error['line'] for error in response.json()['errors']] == [2, 3]
+    csv_data = 'title,brief_description,category,language\n"third, with comma","multi\nline",1,1\n,,1,1\n'
+    response = await async_client.post("/articles/import", params={'format': 'csv'}, content=csv_data.encode())
+    assert response.json()['imported'] == 1
+    assert response.json()['errors'][0]['line'] == 4
+    titles = [article['title'] for article in (await async_client.get("/articles/")).json()['items']]
+    assert titles == ['first', 'second', 'third, with comma']
+
+
+async def test_import_articles_reports_undecodable_lines(async_client: AsyncClient, db_session: AsyncSession,
+                                                         monkeypatch):
+    monkeypatch.setattr(SETTINGS, 'ADMIN_USERNAMES', ['dasha@mail.ru'])
+    await login(async_client)
+    ndjson = b'{"title": "first", "category": 2, "language": 1}\n{"title": "\xff"}\n' \
+             b'{"title": "second", "category": 2, "language": 1}\n'
+    response = await async_client.post("/articles/import", content=ndjson)
+    assert response.status_code == 201
+    assert response.json()['imported'] == 2 and [error['line'] for error in response.json()['errors']] == [2]
+    csv_data = b'title,category,language\n"third\n\xff",1,1\nfourth,1,1\n'
+    response = await async_client.post("/articles/import", params={'format': 'csv'}, content=csv_data)
+    assert response.json()['imported'] == 1 and [error['line'] for error in response.json()['errors']] == [2]
+
+
+async def test_import_articles_rejected_by_database(async_client: AsyncClient, db_session: AsyncSession,
+                                                     monkeypatch):
+    monkeypatch.setattr(SETTINGS, 'ADMIN_USERNAMES', ['dasha@mail.ru'])
+    await login(async_client)
+    response = await async_client.post("/articles/import", params={'user_id': 999},
+                                       content=b'{"title": "first", "category": 2, "language": 1}\n')
+    assert response.status_code == 422
+    assert response.json()['detail'].startswith("Import stopped after 0 articles")
+
+
+async def test_import_articles_requires_admin(async_client: AsyncClient, db_session: AsyncSession):
+    await login(async_client)
+    response = await async_client.post("/articles/import", content=b'{"title": "first"}\n')
+    assert response.status_code == 403
+
+
+async def test_article_conditional_get(async_client: AsyncClient, db_session: AsyncSession):
+    await login(async_client)
+    await create_articles(async_client, 1)
+    response = await async_client.get("/articles/1")
+    etag, last_modified = response.headers['etag'], response.headers['last-modified']
+    response = await async_client.get("/articles/1", headers={'If-None-Match': etag})
+    assert response.status_code == 304 and response.content == b''
+    response = await async_client.get("/articles/1", headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+    await async_client.patch("/articles/1", json={'title': 'renamed'})
+    response = await async_client.get("/articles/1", headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['etag'] != etag
+
+
+async def test_articles_list_conditional_get(async_client: AsyncClient, db_session: AsyncSession):
+    await login(async_client)
+    await create_articles(async_client, 2)
+    etag = (await async_client.get("/articles/")).headers['etag']
+    assert (await async_client.get("/articles/", headers={'If-None-Match': etag})).status_code == 304
+    assert (await async_client.get("/users/1/articles")).headers['etag'] == etag
+    await async_client.delete("/articles/2")
+    assert (await async_client.get("/articles/", headers={'If-None-Match': etag})).status_code == 200
+
+
+async def test_articles_list_serialized_like_detail(async_client: AsyncClient, db_session: AsyncSession):
+    await login(async_client)
+    await create_articles(async_client, 1, url='https://example.com/a', brief_description='brief')
+    detail = (await async_client.get("/articles/1")).json()
+    assert (await async_client.get("/articles/")).json()['items'] == [detail]
+    assert (await async_client.get("/users/1/articles")).json()['items'] == [detail]
+
+
+async def test_articles_sparse_fields(async_client: AsyncClient, db_session: AsyncSession):
+    await login(async_client)
+    await create_articles(async_client, 3)
+    response = await async_client.get("/articles/", params={'fields': 'title,id', 'limit': 2})
+    page = response.json()
+    assert page['items'] == [{'id': 1, 'title': 'article 0'}, {'id': 2, 'title': 'article 1'}]
+    page = (await async_client.get("/articles/", params={'fields': 'title,id', 'cursor': page['next_cursor']})).json()
+    assert page['items'] == [{'id': 3, 'title': 'article 2'}]
+    assert response.headers['etag'] != (await async_client.get("/articles/", params={'limit': 2})).headers['etag']
+    assert (await async_client.get("/articles/1", params={'fields': 'category'})).json() == {'category': 2}
+    page = (await async_client.get("/users/1/articles", params={'fields': 'language'})).json()
+    assert page['items'] == [{'language': 1}] * 3
+    assert (await async_client.get("/articles/", params={'fields': 'title,password'})).status_code == 400
+
+
+async def test_changes_stamped_by_database_clock_in_utc(db_session: AsyncSession):
+    assert abs(await db_session.scalar(select(utcnow())) - datetime.utcnow()) < timedelta(seconds=5)
+    assert "TIMEZONE('utc', CURRENT_TIMESTAMP)" in str(select(utcnow()).compile(dialect=postgresql.dialect()))
+
+
+async def test_article_changes_feed(async_client: AsyncClient, db_session: AsyncSession, monkeypatch):
+    await login(async_client)
+    await create_articles(async_client, 3)
+    assert (await async_client.get("/articles/changes")).json()['items'] == []
+    monkeypatch.setattr(SETTINGS, 'CHANGE_FEED_SETTLE_SECONDS', 0)
+    feed = (await async_client.get("/articles/changes", params={'limit': 2})).json()
+    assert [(change['id'], change['change']) for change in feed['items']] == [(1, 'created'), (2, 'created')]
+    assert feed['has_more']
+    feed = (await async_client.get("/articles/changes", params={'since': feed['next_cursor']})).json()
+    assert [change['id'] for change in feed['items']] == [3] and not feed['has_more']
+
+    await async_client.patch("/articles/1", json={'title': 'renamed'})
+    await async_client.delete("/articles/2")
+    await login(async_client, username='other@mail.ru')
+    await create_articles(async_client, 1)
+    await async_client.delete("/users/2")
+    await login(async_client)
+    feed = (await async_client.get("/articles/changes", params={'since': feed['next_cursor']})).json()
+    assert [(change['id'], change['change']) for change in feed['items']] == [
+        (1, 'updated'), (2, 'deleted'), (4, 'deleted')]
+    assert feed['items'][0]['version'] == 2 and feed['items'][0]['article']['title'] == 'renamed'
+    assert feed['items'][1]['article'] is None
+
+    since = feed['next_cursor']
+    feed = (await async_client.get("/articles/changes", params={'since': since})).json()
+    assert feed == {'items': [], 'next_cursor': since, 'has_more': False}
+    assert (await async_client.get("/articles/changes", params={'since': 'not-a-cursor'})).status_code == 400
@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+import pytest
+from httpx import AsyncClient
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from storage_app.authentication.controllers.password_controller import password_context
+from storage_app.cache import TTLCache
+from storage_app.dataloader import BatchLoader
+from storage_app.profiler import profile_queries
+from storage_app.users.controllers.db_user_controller import DBUserController, user_cache, user_loader
+from storage_app.users.models.db_users import User
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_ttl_cache_lru_and_expiry():
+    cache = TTLCache(maxsize=2, ttl=0.05)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    time.sleep(0.06)
+    assert cache.get('a') is None
+    assert cache.stats()['hits'] == 2
+
+
+async def test_user_lookup_uses_cache(async_client: AsyncClient, db_session: AsyncSession):
+    await async_client.post("/users/", json={'username': 'dasha@mail.ru', 'password': '12345'})
+    await async_client.get("/users/1")
+    hits = user_cache.hits
+    await async_client.get("/users/1")
+    await async_client.get("/users/1")
+    assert user_cache.hits == hits + 2
+
+
+async def test_user_cache_invalidated_on_update(async_client: AsyncClient, db_session: AsyncSession):
+    await async_client.post("/users/", json={'username': 'dasha@mail.ru', 'password': '12345'})
+    await async_client.post("/auth/login", data={'username': 'dasha@mail.ru', 'password': '12345'})
+    assert (await async_client.get("/users/1")).json()['username'] == 'dasha@mail.ru'
+    await async_client.patch("/users/1", json={'username': 'dasha2@mail.ru'})
+    assert (await async_client.get("/users/1")).json()['username'] == 'dasha2@mail.ru'
+
+
+async def test_login_checks_password_against_db(async_client: AsyncClient, db_session: AsyncSession):
+    await async_client.post("/users/", json={'username': 'dasha@mail.ru', 'password': '12345'})
+    await async_client.get("/users/1")
+    assert user_cache.get(('id', 1)).password is None
+    await db_session.execute(update(User).where(User.id == 1).values(password=password_context.hash('54321')))
+    await db_session.commit()
+    response = await async_client.post("/auth/login", data={'username': 'dasha@mail.ru', 'password': '12345'})
+    assert response.status_code == 401
+    response = await async_client.post("/auth/login", data={'username': 'dasha@mail.ru', 'password': '54321'})
+    assert response.status_code == 200
+
+
+async def test_lookups_in_one_tick_share_one_query(async_client: AsyncClient, db_session: AsyncSession):
+    for username in ('dasha@mail.ru', 'dasha2@mail.ru'):
+        await async_client.post("/users/", json={'username': username, 'password': '12345'})
+    batches = user_loader.batches
+    with profile_queries() as profile:
+        users = await asyncio.gather(
+            DBUserController.get_user_by_id(user_id=1, db=db_session),
+            DBUserController.get_user_by_username(username='Dasha2@mail.ru', db=db_session),
+            DBUserController.get_user_by_id(user_id=42, db=db_session),
+        )
+    assert [user and user.id for user in users] == [1, 2, None]
+    assert profile.count == 1 and user_loader.batches == batches + 1
+
+
+async def test_batch_loader_shares_errors():
+    class Session:
+        async def __aenter__(self):
+            return None
+
+        async def __aexit__(self, *args):
+            return False
+
+    async def fail(keys, db):
+        raise ValueError(keys)
+
+    loader = BatchLoader(fail, session_factory=Session)
+    results = await asyncio.gather(loader.load(1), loader.load(2), loader.load(1), return_exceptions=True)
+    assert [result.args[0] for result in results] == [[1, 2]] * 3
+
+
+async def test_batch_loader_reuses_session_of_a_lone_caller():
+    opened, used = [], []
+
+    def session_factory():
+        opened.append(1)
+        return Session()
+
+    class Session:
+        async def __aenter__(self):
+            return 'own session'
+
+        async def __aexit__(self, *args):
+            return False
+
+    async def load(keys, db):
+        used.append(db)
+        return {key: key for key in keys}
+
+    loader = BatchLoader(load, session_factory=session_factory)
+    assert await loader.load(1, 'request session') == 1
+    assert await asyncio.gather(loader.load(1, 'first'), loader.load(1, 'second')) == [1, 1]
+    assert await asyncio.gather(loader.load(1, 'first'), loader.load(2, 'second')) == [1, 2]
+    assert used == ['request session', 'own session', 'own session'] and len(opened) == 2
+    assert loader.stats()['running'] == 0
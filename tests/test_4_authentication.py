@@ -0,0 +1,72 @@
+import asyncio
+import threading
+
+import pytest
+from httpx import AsyncClient
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from storage_app.authentication.controllers.password_controller import HashingPool, hashing_pool
+from storage_app.users.controllers.db_user_controller import user_cache
+
+pytestmark = pytest.mark.asyncio
+
+
+async def login(async_client: AsyncClient):
+    await async_client.post("/users/", json={'username': 'dasha@mail.ru', 'password': '12345'})
+    await async_client.post("/auth/login", data={'username': 'dasha@mail.ru', 'password': '12345'})
+    return dict(async_client.cookies)
+
+
+async def test_authentication_without_user_lookup(async_client: AsyncClient, db_session: AsyncSession):
+    await login(async_client)
+    misses, hits = user_cache.misses, user_cache.hits
+    response = await async_client.get("/auth/dasha")
+    assert response.status_code == 200
+    assert (user_cache.misses, user_cache.hits) == (misses, hits)
+
+
+async def test_logout_revokes_tokens(async_client: AsyncClient, db_session: AsyncSession):
+    cookies = await login(async_client)
+    await async_client.get("/auth/logout")
+    response = await async_client.get("/auth/dasha", cookies=cookies)
+    assert response.status_code == 401
+
+
+async def test_password_change_revokes_tokens(async_client: AsyncClient, db_session: AsyncSession):
+    cookies = await login(async_client)
+    await async_client.patch("/users/1", json={'password': '54321'})
+    response = await async_client.get("/auth/dasha", cookies=cookies)
+    assert response.status_code == 401
+    await async_client.post("/auth/login", data={'username': 'dasha@mail.ru', 'password': '54321'})
+    response = await async_client.get("/auth/dasha")
+    assert response.status_code == 200
+
+
+async def test_hashing_pool_rejects_when_saturated(async_client: AsyncClient, db_session: AsyncSession):
+    workers, queue_limit = hashing_pool.workers, hashing_pool.queue_limit
+    hashing_pool.workers, hashing_pool.queue_limit = 1, 0
+    try:
+        responses = await asyncio.gather(*[
+            async_client.post("/users/", json={'username': f'dasha{i}@mail.ru', 'password': '12345'})
+            for i in range(3)
+        ])
+    finally:
+        hashing_pool.workers, hashing_pool.queue_limit = workers, queue_limit
+    assert sorted(response.status_code for response in responses) == [201, 503, 503]
+    stats = (await async_client.get("/internal/password-pool")).json()
+    assert stats['rejected'] >= 2 and stats['busy'] == 0
+
+
+async def test_hashing_pool_keeps_slot_of_cancelled_call():
+    pool, release = HashingPool(workers=1, queue_limit=0), threading.Event()
+    task = asyncio.ensure_future(pool.run(release.wait))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert pool.stats()['busy'] == 1
+    release.set()
+    while pool.in_flight:
+        await asyncio.sleep(0.01)
+    assert await pool.run(sum, [1, 2]) == 3 and pool.stats()['busy'] == 0
@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from storage_app.db_config import TimedQueuePool
+from storage_app.logger_config import BatchingFileSink, SiteRateLimit, console_rate_limit, log_rate_limit, logger
+from storage_app.metrics import db_queries, instrument_engine
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_timed_pool_stats(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/pool.db", poolclass=TimedQueuePool,
+                                 pool_size=1, max_overflow=1)
+    async with engine.connect() as first, engine.connect() as second:
+        await first.execute(text("select 1"))
+        await second.execute(text("select 1"))
+        stats = engine.pool.stats()
+        assert stats['checked_out'] == 2 and stats['overflow'] == 1
+    stats = engine.pool.stats()
+    assert stats['checked_out'] == 0 and stats['checkouts'] == 2
+    await engine.dispose()
+
+
+async def test_db_pool_endpoint(async_client: AsyncClient):
+    response = await async_client.get("/internal/db-pool")
+    assert response.status_code == 200
+    assert {'checked_out', 'overflow', 'avg_wait_ms', 'max_wait_ms'} <= response.json().keys()
+
+
+async def test_user_cache_endpoint(async_client: AsyncClient):
+    response = await async_client.get("/internal/user-cache")
+    assert response.status_code == 200
+    assert response.json().keys() == {'size', 'maxsize', 'hits', 'misses'}
+
+
+async def test_batching_sink_writes_and_drops(tmp_path):
+    sink = BatchingFileSink(str(tmp_path / 'debug.json'), queue_size=2, batch_size=10, flush_interval=0.01)
+    sink._queue.put(None)
+    sink._thread.join()
+    for i in range(3):
+        sink.write(f'{i}\n')
+    assert sink.dropped == 1
+    sink._thread = threading.Thread(target=sink._run, daemon=True)
+    sink._thread.start()
+    sink.stop()
+    assert (tmp_path / 'debug.json').read_text() == '0\n1\n'
+    assert sink.stats()['written'] == 2
+
+
+async def test_site_rate_limit():
+    rate_limit = SiteRateLimit(rate=2)
+    records = [{'level': logger.level('INFO'), 'name': 'module', 'line': 1, 'extra': {}} for _ in range(4)]
+    assert [rate_limit(record) for record in records] == [True, True, False, False]
+    assert rate_limit({'level': logger.level('ERROR'), 'name': 'module', 'line': 1, 'extra': {}})
+    assert rate_limit.suppressed == 2
+
+
+async def test_logging_endpoint(async_client: AsyncClient):
+    assert console_rate_limit is not log_rate_limit
+    response = await async_client.get("/internal/logging")
+    assert {'written', 'suppressed', 'console_suppressed'} <= response.json().keys()
+
+
+async def test_metrics_endpoint(async_client: AsyncClient):
+    await async_client.get("/users/")
+    await async_client.get("/no-such-route")
+    response = await async_client.get("/metrics")
+    assert response.status_code == 200 and response.headers['content-type'].startswith('text/plain')
+    assert 'http_requests_total{method="GET",route="/users/",status="200"}' in response.text
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"}' in response.text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/users/",le="+Inf"}' in response.text
+    assert 'db_pool_connections{engine="primary",state="checked_out"} 0.0' in response.text
+    assert 'user_cache_lookups_total{result="misses"}' in response.text
+
+
+async def test_engine_queries_timed(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/metrics.db")
+    instrument_engine(engine, 'test')
+    async with engine.connect() as connection:
+        await connection.execute(text("select 1"))
+        await connection.execute(text("create table t (id integer)"))
+    assert db_queries.count('test', 'SELECT') == 1 and db_queries.count('test', 'OTHER') == 1
+    await engine.dispose()
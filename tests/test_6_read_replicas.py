@@ -0,0 +1,39 @@
+import time
+
+import pytest
+from starlette.requests import Request
+
+from storage_app import db_config
+from storage_app.db_config import READ_PRIMARY_COOKIE, ReplicaRouter, get_read_db
+
+pytestmark = pytest.mark.asyncio
+
+
+def make_request(cookie: str = '') -> Request:
+    return Request({'type': 'http', 'headers': [(b'cookie', cookie.encode())] if cookie else []})
+
+
+async def read_engine(request: Request):
+    sessions = get_read_db(request)
+    db = await sessions.__anext__()
+    await sessions.aclose()
+    return db.bind
+
+
+async def test_read_db_round_robin_and_fallback(tmp_path, monkeypatch):
+    router = ReplicaRouter([f"sqlite+aiosqlite:///{tmp_path}/first.db", f"sqlite+aiosqlite:///{tmp_path}/second.db",
+                            f"sqlite+aiosqlite:///{tmp_path}/missing/third.db"])
+    monkeypatch.setattr(db_config, 'replicas', router)
+    engines = [await read_engine(make_request()) for _ in range(4)]
+    assert engines == [router.engines[0], router.engines[1], router.engines[0], router.engines[1]]
+    assert router.down_until[2] > time.time()
+    for replica in router.engines:
+        await replica.dispose()
+
+
+async def test_read_db_sticks_to_primary_after_write(tmp_path, monkeypatch):
+    router = ReplicaRouter([f"sqlite+aiosqlite:///{tmp_path}/first.db"])
+    monkeypatch.setattr(db_config, 'replicas', router)
+    request = make_request(f'{READ_PRIMARY_COOKIE}={time.time() + 5}')
+    assert await read_engine(request) is db_config.engine
+    await router.engines[0].dispose()
@@ -0,0 +1,167 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from storage_app import db_config
+from storage_app.articles.controllers.article_cache import article_cache
+from storage_app.articles.models.api_article_models import ArticleRecord, ArticleRecordPage
+from storage_app.cache import MemoryBackend, ReadThroughCache, RedisBackend
+from storage_app.db_config import ReplicaRouter, primary_or_none
+from tests.test_2_article_api import create_articles, login
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value.encode()
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+
+    async def flushdb(self):
+        self.data.clear()
+
+
+async def test_article_read_through_and_invalidation(async_client: AsyncClient, db_session: AsyncSession):
+    await login(async_client)
+    await create_articles(async_client, 1)
+    await async_client.get("/articles/1")
+    hits = article_cache.hits
+    assert (await async_client.get("/articles/1")).json()['title'] == 'article 0'
+    assert article_cache.hits == hits + 1
+    await async_client.patch("/articles/1", json={'title': 'renamed'})
+    assert (await async_client.get("/articles/1")).json()['title'] == 'renamed'
+    await async_client.delete("/articles/1")
+    assert (await async_client.get("/articles/1")).status_code == 404
+
+
+async def test_user_articles_invalidated_on_create(async_client: AsyncClient, db_session: AsyncSession):
+    await login(async_client)
+    await create_articles(async_client, 1)
+    assert len((await async_client.get("/users/1/articles")).json()['items']) == 1
+    hits = article_cache.hits
+    assert len((await async_client.get("/users/1/articles")).json()['items']) == 1
+    assert article_cache.hits == hits + 1
+    await create_articles(async_client, 1)
+    assert len((await async_client.get("/users/1/articles")).json()['items']) == 2
+
+
+async def test_stale_entry_served_while_revalidating(async_client: AsyncClient, db_session: AsyncSession,
+                                                    monkeypatch):
+    monkeypatch.setattr(article_cache, 'ttl', 0)
+    await login(async_client)
+    await create_articles(async_client, 1)
+    await async_client.get("/articles/1")
+    stale_hits, refreshes = article_cache.stale_hits, article_cache.refreshes
+    assert (await async_client.get("/articles/1")).status_code == 200
+    assert article_cache.stale_hits == stale_hits + 1
+    await asyncio.sleep(0.1)
+    assert article_cache.refreshes == refreshes + 1
+    assert (await async_client.get("/internal/article-cache")).json()['hit_rate'] > 0
+
+
+async def test_redis_backend_round_trip():
+    backend = RedisBackend(FakeRedis(), models={'article': ArticleRecord, 'user-articles': ArticleRecordPage})
+    cache = ReadThroughCache(backend, ttl=30, stale_ttl=30, session_factory=None)
+    record = ArticleRecord(id=1, user_id=1, title='cached', category=2, language=1,
+                           created_at='2023-01-01T00:00:00', updated_at='2023-01-02T00:00:00')
+
+    async def load(db):
+        return record
+
+    assert await cache.get_or_load('article:1', load, db='session') == record
+    assert await cache.get_or_load('article:1', load, db=None) == record
+    assert cache.stats()['hits'] == 1
+    await cache.bump('user-articles:1')
+    assert await cache.generation('user-articles:1') == 1
+    await cache.delete('article:1')
+    assert await backend.get('article:1') is None
+
+
+async def test_load_racing_delete_not_stored():
+    cache = ReadThroughCache(MemoryBackend(maxsize=10, counter_ttl=60), ttl=30, stale_ttl=30, session_factory=None)
+    loading, written = asyncio.Event(), asyncio.Event()
+
+    async def load(db):
+        loading.set()
+        await written.wait()
+        return 'before write'
+
+    miss = asyncio.ensure_future(cache.get_or_load('article:1', load, db='session'))
+    await loading.wait()
+    await cache.delete('article:1')
+    written.set()
+    assert await miss == 'before write'
+    assert await cache.backend.get('article:1') is None
+    assert not cache._in_flight and not cache._deleted_at
+
+
+async def test_miss_on_replica_session_loads_from_primary(tmp_path, monkeypatch, db_session: AsyncSession):
+    router = ReplicaRouter([f"sqlite+aiosqlite:///{tmp_path}/replica.db"])
+    monkeypatch.setattr(db_config, 'replicas', router)
+
+    @asynccontextmanager
+    async def primary_session():
+        yield db_session
+
+    cache, sessions = ReadThroughCache(MemoryBackend(maxsize=10, counter_ttl=60), ttl=30, stale_ttl=30,
+                                       session_factory=primary_session), []
+
+    async def load(db):
+        sessions.append(db)
+        return 'row'
+
+    async with router.sessions[0]() as replica_session:
+        assert primary_or_none(replica_session) is None
+        await cache.get_or_load('article:1', load, primary_or_none(replica_session))
+    await cache.get_or_load('article:2', load, primary_or_none(db_session))
+    assert sessions == [db_session, db_session]
+    await router.engines[0].dispose()
+
+
+async def test_background_reload_kept_until_done(db_session: AsyncSession):
+    @asynccontextmanager
+    async def session():
+        yield db_session
+
+    cache, reloading = ReadThroughCache(MemoryBackend(maxsize=10, counter_ttl=60), ttl=0, stale_ttl=30,
+                                        session_factory=session), asyncio.Event()
+
+    async def load(db):
+        await reloading.wait()
+        return 'reloaded'
+
+    await cache.set('article:1', 'stale')
+    assert await cache.get_or_load('article:1', load, db_session) == 'stale'
+    assert len(cache._tasks) == 1
+    reloading.set()
+    await asyncio.gather(*cache._tasks)
+    await asyncio.sleep(0)
+    assert not cache._tasks and (await cache.backend.get('article:1'))[1] == 'reloaded'
+
+
+async def test_memory_backend_counters_expire():
+    backend = MemoryBackend(maxsize=10, counter_ttl=0.01)
+    await backend.incr('user-articles:1:generation')
+    first = await backend.counter('user-articles:1:generation')
+    assert first > 0
+    await asyncio.sleep(0.02)
+    assert await backend.counter('user-articles:1:generation') == 0
+    await backend.incr('user-articles:2:generation')
+    assert list(backend._counters) == ['user-articles:2:generation']
+    await backend.incr('user-articles:1:generation')
+    assert await backend.counter('user-articles:1:generation') > first
@@ -0,0 +1,66 @@
+import re
+
+import pytest
+from httpx import AsyncClient, Response
+from sqlalchemy import event, text
+from sqlalchemy.engine.default import CACHE_HIT
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from storage_app.articles.controllers.db_article_controller import DBArticleController
+from storage_app.config import SETTINGS
+from storage_app.profiler import profile_queries
+from storage_app.users.controllers.db_user_controller import load_users
+from tests.test_2_article_api import login
+
+pytestmark = pytest.mark.asyncio
+
+
+def queries(response: Response) -> int:
+    return int(re.search(r'desc="(\d+) queries"', response.headers['server-timing']).group(1))
+
+
+@pytest.fixture
+def profiler(monkeypatch):
+    monkeypatch.setattr(SETTINGS, 'SQL_PROFILER', True)
+
+
+async def test_route_query_budgets(async_client: AsyncClient, db_session: AsyncSession, profiler):
+    await login(async_client)
+    assert queries(await async_client.post("/articles/", json={'title': 'first', 'category': 2, 'language': 1})) <= 2
+    assert queries(await async_client.get("/articles/")) == 1
+    assert queries(await async_client.get("/articles/1")) == 1
+    assert queries(await async_client.get("/articles/1")) == 0
+    assert queries(await async_client.get("/users/1/articles")) <= 2
+    assert queries(await async_client.get("/users/1/articles")) == 0
+
+
+async def test_repeated_statements_flagged(db_session: AsyncSession):
+    with profile_queries() as profile:
+        for user_id in (1, 2, 3):
+            await db_session.execute(text("select * from users where id = :id"), {'id': user_id})
+        await db_session.execute(text("select 1"))
+    assert profile.count == 4
+    assert profile.repeated() == {"select * from users where id = ?": 3}
+
+
+async def test_no_server_timing_when_profiler_off(async_client: AsyncClient, db_session: AsyncSession):
+    await login(async_client)
+    assert 'server-timing' not in (await async_client.get("/articles/")).headers
+
+
+async def test_hot_lookups_reuse_compiled_sql(db_session: AsyncSession):
+    cache_hits = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        cache_hits.append(context.cache_hit is CACHE_HIT)
+
+    sync_engine = db_session.bind.sync_engine
+    event.listen(sync_engine, 'after_cursor_execute', record)
+    try:
+        await DBArticleController.get_article_by_id(article_id=1, db=db_session)
+        await DBArticleController.get_article_by_id(article_id=2, db=db_session)
+        await load_users([('id', 1)], db_session)
+        await load_users([('id', 2), ('username', 'user@example.com')], db_session)
+    finally:
+        event.remove(sync_engine, 'after_cursor_execute', record)
+    assert cache_hits[1] and cache_hits[3]
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from storage_app.profiler import profile_queries
+from storage_app.singleflight import SingleFlight
+from storage_app.users.controllers.db_user_controller import DBUserController, user_lookups
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_concurrent_calls_share_one_execution():
+    flight, started = SingleFlight('test'), []
+
+    async def load():
+        started.append(1)
+        await asyncio.sleep(0.01)
+        return 'value'
+
+    results = await asyncio.gather(*(flight.do('key', load) for _ in range(5)))
+    assert results == ['value'] * 5 and len(started) == 1
+    assert flight.stats() == {'calls': 1, 'coalesced': 4, 'in_flight': 0}
+
+
+async def test_errors_are_shared_and_not_cached():
+    flight = SingleFlight('test')
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError('boom')
+
+    results = await asyncio.gather(*(flight.do('key', fail) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+
+    async def load():
+        return 'value'
+
+    assert await flight.do('key', load) == 'value'
+
+
+async def test_cancelled_leader_hands_over_to_waiter():
+    flight = SingleFlight('test')
+
+    async def load():
+        await asyncio.sleep(0.05)
+        return 'value'
+
+    leader = asyncio.ensure_future(flight.do('key', load))
+    await asyncio.sleep(0)
+    waiter = asyncio.ensure_future(flight.do('key', load))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await waiter == 'value'
+    assert leader.cancelled() and flight.calls == 2
+
+
+async def test_cancelled_waiter_leaves_leader_running():
+    flight = SingleFlight('test')
+
+    async def load():
+        await asyncio.sleep(0.02)
+        return 'value'
+
+    leader = asyncio.ensure_future(flight.do('key', load))
+    await asyncio.sleep(0)
+    waiter = asyncio.ensure_future(flight.do('key', load))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    assert await leader == 'value'
+
+
+async def test_concurrent_user_lookups_run_one_query(async_client: AsyncClient, db_session: AsyncSession):
+    await async_client.post("/users/", json={'username': 'dasha@mail.ru', 'password': '12345'})
+    coalesced = user_lookups.coalesced
+    with profile_queries() as profile:
+        users = await asyncio.gather(*(DBUserController.get_user_by_username(username='dasha@mail.ru', db=db_session)
+                                       for _ in range(5)))
+    assert {user.id for user in users} == {1}
+    assert profile.count == 1 and user_lookups.coalesced == coalesced + 4